@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from cube_core import COLOUR_LETTERS, SOLVED_STATE, apply_moves, parse_state
+from cube_solver import get_tables, solve
+from cube_validation import check_state, is_valid
+from move_compiler import format_moves, parse_moves
+from solution_cache import DEFAULT_MAX_ENTRIES, SolutionCache
+
+# Scrambles queued per worker, enough to keep every core busy without reading the whole input at once
+JOBS_PER_WORKER = 4
+
+
+def read_scramble(text: str):
+    # A line is either a state of 54 colour initials or a sequence of moves applied to a solved cube
+    # Moves written without spaces, such as RBRB..., can also be 54 colour initials, so a line is only read as a state
+    # if a real cube can reach it, which needs all six colours and so can never be a move sequence
+    text = text.strip()
+    if len(text) == len(SOLVED_STATE) and all(letter in COLOUR_LETTERS for letter in text.upper()):
+        state = parse_state(text)
+        if is_valid(state):
+            return state
+        try:
+            moves = parse_moves(text)
+        except ValueError:
+            # Neither moves nor a reachable state, so report what is wrong with it as a state
+            check_state(state)
+            raise
+        return apply_moves(SOLVED_STATE, moves)
+    return apply_moves(SOLVED_STATE, parse_moves(text))
+
+
+def solve_line(line_number: int, text: str, max_length: int) -> dict:
+    # Runs in a worker, so it reports bad input instead of raising it
+    result = {"line": line_number, "scramble": text.strip()}
+    try:
+        solution = solve(read_scramble(text), max_length)
+    except ValueError as error:
+        result["error"] = str(error)
+    else:
+        result["solution"] = format_moves(solution)
+        result["length"] = len(solution)
+    return result
+
+
+def _load_tables():
+    # Map the solver tables once per worker rather than once per scramble
+    get_tables()
+
+
+def _cached_job(cache: SolutionCache, line_number: int, text: str) -> Future | None:
+    # A finished job when the cache already knows a solution, so the scramble never reaches a worker
+    try:
+        solution = cache.get(read_scramble(text))
+    except ValueError:
+        # Let the worker report the bad line like any other
+        return None
+    if solution is None:
+        return None
+    job = Future()
+    job.set_result({"line": line_number, "scramble": text.strip(),
+                    "solution": format_moves(solution), "length": len(solution)})
+    return job
+
+
+def solve_stream(lines, workers: int | None = None, max_length: int = 24, cache: SolutionCache | None = None):
+    # Yield a result for every non-blank line, in input order, keeping a bounded number of jobs in flight
+    workers = workers or os.cpu_count() or 1
+    # Spawned workers import only this module and the numpy solver, never Qt or pyvista
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_load_tables) as executor:
+        pending = collections.deque()
+
+        def finish(job: Future) -> dict:
+            result = job.result()
+            if cache is not None and "solution" in result:
+                cache.put(read_scramble(result["scramble"]), parse_moves(result["solution"]))
+            return result
+
+        for line_number, text in enumerate(lines, start=1):
+            if not text.strip() or text.lstrip().startswith("#"):
+                continue
+            job = _cached_job(cache, line_number, text) if cache is not None else None
+            pending.append(job or executor.submit(solve_line, line_number, text, max_length))
+            if len(pending) >= workers * JOBS_PER_WORKER:
+                yield finish(pending.popleft())
+        while pending:
+            yield finish(pending.popleft())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Solve many scrambles across every core.")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="file with one scramble per line, as moves or 54 colour initials (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="where to write results (default: stdout)")
+    parser.add_argument("-f", "--format", choices=("jsonl", "text"), default="jsonl",
+                        help="one JSON object per line, or just the solution moves")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--max-length", type=int, default=24, help="longest solution to accept before searching deeper")
+    parser.add_argument("--cache", metavar="PATH", help="reuse solutions of symmetric positions, kept in this file")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES, help="solutions kept in memory")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    target = sys.stdout if args.output == "-" else open(args.output, "w")
+    cache = SolutionCache(args.cache_size, args.cache) if args.cache else None
+    failures = 0
+    try:
+        for result in solve_stream(source, args.workers, args.max_length, cache):
+            failures += "error" in result
+            if args.format == "jsonl":
+                target.write(json.dumps(result) + "\n")
+            elif "error" in result:
+                target.write(f"ERROR line {result['line']}: {result['error']}\n")
+            else:
+                target.write(result["solution"] + "\n")
+            target.flush()
+    finally:
+        if cache is not None:
+            print(json.dumps(cache.stats()), file=sys.stderr)
+            cache.close()
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
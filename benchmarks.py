@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import cube_animation
+import cube_service
+import rubik_cube
+from cube_core import MOVES, SOLVED_STATE, apply_moves, random_moves
+from cube_solver import get_tables, solve
+
+# Default scramble set for the solver, fixed so every run solves the same cubes
+SOLVE_SEED = 2024
+SOLVE_SCRAMBLES = 20
+SCRAMBLE_LENGTH = 100
+
+# A metric regresses when it is this much worse than the baseline
+DEFAULT_THRESHOLD = 0.2
+
+
+def _best_time(function, repeats: int = 5) -> float:
+    # Best of several runs, which is the least noisy estimate of what the code itself costs
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _metric(value: float, unit: str, better: str) -> dict:
+    return {"value": value, "unit": unit, "better": better}
+
+
+def bench_moves(count: int = 20000) -> dict:
+    # Moves per second through each of the GUI's move functions, with no plotter attached
+    sides = sorted(MOVES)
+    moves = {"rotate_side": lambda cube, i: rubik_cube.rotate_side(sides[i % 6], None, cube),
+             "reverse_rotate_side": lambda cube, i: rubik_cube.reverse_rotate_side(sides[i % 6], None, cube),
+             "rotate_cube_x": lambda cube, i: rubik_cube.rotate_cube_x(None),
+             "rotate_cube_y": lambda cube, i: rubik_cube.rotate_cube_y(None),
+             "slice": lambda cube, i: rubik_cube.cube_rotation(None, "MES"[i % 3], "C", "N")}
+    results = dict()
+    for name, move in moves.items():
+        def run():
+            for i in range(count):
+                move(rubik_cube.current_cube, i)
+        rubik_cube.reset_cube()
+        results[f"moves_per_second.{name}"] = _metric(count / _best_time(run), "moves/s", "higher")
+    rubik_cube.reset_cube()
+    return results
+
+
+def bench_randomise(repeats: int = 20) -> dict:
+    # Wall time of the Randomise button without drawing
+    def run():
+        rubik_cube.reset_cube()
+        rubik_cube.randomise_cube()
+    return {"randomise_cube": _metric(_best_time(run, repeats), "s", "lower")}
+
+
+def bench_mesh(count: int = 50) -> dict:
+    # Mesh building and per-move redraw latency on an offscreen plotter
+    try:
+        import pyvista as pv
+    except ImportError:
+        return dict()
+    results = {"generate_mesh": _metric(_best_time(lambda: rubik_cube.generate_mesh(SOLVED_STATE), 20), "s", "lower")}
+
+    plotter = pv.Plotter(off_screen=True)
+    actor = plotter.add_mesh(rubik_cube.generate_mesh(SOLVED_STATE), scalars='colors', lighting=False, rgb=True,
+                             preference='cell', show_edges=True)
+    rubik_cube.cube_mesh = actor.mapper.dataset
+    plotter.show(auto_close=False, interactive=False)
+    try:
+        rubik_cube.reset_cube(plotter)
+        latencies = []
+        for i in range(count):
+            start = time.perf_counter()
+            rubik_cube.rotate_side("F", plotter, rubik_cube.current_cube)
+            latencies.append(time.perf_counter() - start)
+        results["mesh_update_latency"] = _metric(statistics.median(latencies), "s", "lower")
+    finally:
+        rubik_cube.cube_mesh = None
+        rubik_cube.reset_cube()
+        plotter.close()
+    return results
+
+
+def bench_animation(frames: int = 1000) -> dict:
+    # Cost of moving the turning layer's points for one animation frame, without drawing
+    points = rubik_cube.MESH_POINTS.copy()
+    components = cube_animation.turn_components(3, "U", rubik_cube.MESH_STICKERS)
+
+    def run():
+        animation = cube_animation.TurnAnimation(points, components, np.full(3, 1.5), frames)
+        while not animation.step():
+            pass
+    return {"turn_frame": _metric(_best_time(run) / frames, "s", "lower")}
+
+
+def bench_solve(seed: int = SOLVE_SEED, scrambles: int = SOLVE_SCRAMBLES) -> dict:
+    # Solve time and solution length over a seeded set of scrambles, with the tables already loaded
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        cubes = [apply_moves(SOLVED_STATE, random_moves(SCRAMBLE_LENGTH)) for _ in range(scrambles)]
+    finally:
+        random.setstate(state)
+    get_tables()
+
+    times = []
+    lengths = []
+    for cube in cubes:
+        start = time.perf_counter()
+        solution = solve(cube)
+        times.append(time.perf_counter() - start)
+        lengths.append(len(solution))
+        if not (apply_moves(cube, solution) == SOLVED_STATE).all():
+            raise RuntimeError("Solver returned a sequence that does not solve the cube")
+    return {"solve_time.median": _metric(statistics.median(times), "s", "lower"),
+            "solve_time.p95": _metric(float(np.percentile(times, 95)), "s", "lower"),
+            "solution_length.mean": _metric(statistics.mean(lengths), "moves", "lower")}
+
+
+def bench_service(requests: int = 20000, connections: int = 64) -> dict:
+    # Apply requests per second and their latency through the HTTP service on localhost, client included
+    async def run() -> dict:
+        service = cube_service.CubeService(workers=1)
+        server = await cube_service.start_service(service, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await cube_service.load_test("127.0.0.1", port, "/apply", {"moves": "R U R' U'"},
+                                                requests, connections)
+        finally:
+            server.close()
+            await server.wait_closed()
+            service.close()
+
+    results = asyncio.run(run())
+    return {"service.apply_per_second": _metric(results["requests_per_second"], "requests/s", "higher"),
+            "service.apply_p99": _metric(results["p99_ms"] / 1000, "s", "lower")}
+
+
+BENCHMARKS = {"moves": bench_moves,
+              "randomise": bench_randomise,
+              "mesh": bench_mesh,
+              "animation": bench_animation,
+              "solve": bench_solve,
+              "service": bench_service}
+
+
+def run_benchmarks(names=None) -> dict:
+    metrics = dict()
+    for name in names or BENCHMARKS:
+        metrics.update(BENCHMARKS[name]())
+    return {"python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "metrics": metrics}
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    # Metrics that are worse than the baseline by more than the threshold, as (name, baseline, current, change)
+    regressions = []
+    for name, metric in results["metrics"].items():
+        if name not in baseline["metrics"]:
+            continue
+        before = baseline["metrics"][name]["value"]
+        after = metric["value"]
+        if before == 0:
+            continue
+        change = (after - before) / before
+        worse = -change if metric["better"] == "higher" else change
+        if worse > threshold:
+            regressions.append((name, before, after, change))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark cube moves, rendering and solving.")
+    parser.add_argument("benchmarks", nargs="*", help=f"benchmarks to run, from {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results against a baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="fraction a metric may worsen before it counts as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+
+    results = run_benchmarks(args.benchmarks)
+    for name, metric in results["metrics"].items():
+        print(f"{name:40} {metric['value']:14.6g} {metric['unit']}")
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before:.6g} -> {after:.6g} ({change:+.0%})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
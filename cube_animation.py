@@ -0,0 +1,61 @@
+import math
+
+import numpy as np
+
+import nxn_cube
+
+# Longest a quarter turn takes, and how often the turning layer is redrawn
+TURN_SECONDS = 0.15
+FRAMES_PER_SECOND = 60
+
+
+def unshared_mesh(vertices: np.ndarray, faces: np.ndarray) -> tuple:
+    # Give every cell its own four corners, so turning a layer cannot drag the cells next to it
+    corners = faces.reshape(-1, 5)[:, 1:]
+    points = vertices[corners.ravel()].astype(np.float64)
+    cells = np.hstack([np.full((len(corners), 1), 4), np.arange(corners.size).reshape(-1, 4)]).ravel()
+    return points, cells
+
+
+def rotation_matrix(axis: np.ndarray, angle: float) -> np.ndarray:
+    # Rotation by angle radians about a unit axis, anticlockwise looking down the axis
+    x, y, z = axis
+    cross = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+    return np.eye(3) + math.sin(angle) * cross + (1 - math.cos(angle)) * cross @ cross
+
+
+def turn_components(n: int, move: str, cell_stickers: np.ndarray) -> list:
+    # The point indices, axis and angle of every group of cells a move turns
+    # cell_stickers gives the sticker drawn on each cell, and cell i owns points 4i to 4i + 3
+    components = []
+    for matrix, layers, quarter_turns in nxn_cube.move_layers(n, move):
+        cells = np.flatnonzero(np.isin(cell_stickers, nxn_cube.layer_stickers(n, matrix, layers)))
+        points = (cells[:, None] * 4 + np.arange(4)).ravel()
+        # A quarter turn's matrix is anticlockwise about the axis its antisymmetric part points along
+        axis = np.array([matrix[2, 1] - matrix[1, 2], matrix[0, 2] - matrix[2, 0], matrix[1, 0] - matrix[0, 1]]) / 2
+        components.append((points, axis, quarter_turns * math.pi / 2))
+    return components
+
+
+class TurnAnimation:
+    # Turns the moving points of a mesh a little further every frame, writing into the mesh's own points
+    # Only the turning cells are touched, and the colours are left for the caller to permute once it ends
+    def __init__(self, points: np.ndarray, components: list, centre: np.ndarray, frames: int):
+        self.points = points
+        self.centre = centre
+        self.frames = frames
+        self.frame = 0
+        self.components = [(indices, points[indices] - centre, axis, angle) for indices, axis, angle in components]
+
+    def step(self) -> bool:
+        # Draw the next frame, returning True once the turn is complete
+        self.frame += 1
+        progress = (1 - math.cos(math.pi * self.frame / self.frames)) / 2
+        for indices, offsets, axis, angle in self.components:
+            self.points[indices] = offsets @ rotation_matrix(axis, angle * progress).T + self.centre
+        return self.frame >= self.frames
+
+    def finish(self):
+        # Put the points back where they started, ready for the colours to be permuted in their place
+        for indices, offsets, _, _ in self.components:
+            self.points[indices] = offsets + self.centre
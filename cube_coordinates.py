@@ -0,0 +1,93 @@
+import numpy as np
+
+from cube_core import as_state, state_to_cube
+from cube_cubies import (CENTRE_ORIENTATIONS, CENTRE_STICKERS, ORIENTATION_LOOKUP, cubies_to_states,
+                         permutation_rank, permutation_unrank, states_to_cubies)
+from cube_solver import flip_coordinate, twist_coordinate
+
+# Number of values each coordinate can take
+ORIENTATIONS = 24
+CORNER_PERMUTATIONS = 40320
+TWISTS = 3 ** 7
+EDGE_PERMUTATIONS = 479001600
+FLIPS = 2 ** 11
+
+# A key is split into a corner half and an edge half, each small enough for an int64
+CORNER_KEYS = ORIENTATIONS * CORNER_PERMUTATIONS * TWISTS
+EDGE_KEYS = EDGE_PERMUTATIONS * FLIPS
+
+# Constants of the splitmix64 finaliser used to hash keys
+SPLITMIX_INCREMENT = np.uint64(0x9E3779B97F4A7C15)
+SPLITMIX_FIRST = np.uint64(0xBF58476D1CE4E5B9)
+SPLITMIX_SECOND = np.uint64(0x94D049BB133111EB)
+
+
+def encode_states(states: np.ndarray) -> tuple:
+    # Corner and edge halves of the key of every row of an (N, 54) array
+    states = np.atleast_2d(states)
+    cp, co, ep, eo = states_to_cubies(states)
+    orientation = ORIENTATION_LOOKUP[states[:, CENTRE_STICKERS[0]], states[:, CENTRE_STICKERS[1]]]
+    if (cp < 0).any() or (ep < 0).any() or (orientation < 0).any():
+        raise ValueError("Only states of a real cube have coordinates")
+    corner_keys = (orientation * CORNER_PERMUTATIONS + permutation_rank(cp)) * TWISTS + twist_coordinate(co)
+    edge_keys = permutation_rank(ep) * FLIPS + flip_coordinate(eo)
+    return corner_keys.astype(np.int64), edge_keys.astype(np.int64)
+
+
+def decode_keys(corner_keys: np.ndarray, edge_keys: np.ndarray) -> np.ndarray:
+    # Inverse of encode_states
+    corner_keys = np.atleast_1d(np.asarray(corner_keys, dtype=np.int64))
+    edge_keys = np.atleast_1d(np.asarray(edge_keys, dtype=np.int64))
+    corners, twists = np.divmod(corner_keys, TWISTS)
+    orientation, corner_ranks = np.divmod(corners, CORNER_PERMUTATIONS)
+    edge_ranks, flips = np.divmod(edge_keys, FLIPS)
+
+    co = np.zeros((len(corner_keys), 8), dtype=np.intp)
+    for position in range(6, -1, -1):
+        twists, co[:, position] = np.divmod(twists, 3)
+    co[:, 7] = -co[:, :7].sum(axis=1) % 3
+    eo = np.zeros((len(edge_keys), 12), dtype=np.intp)
+    for position in range(10, -1, -1):
+        flips, eo[:, position] = np.divmod(flips, 2)
+    eo[:, 11] = eo[:, :11].sum(axis=1) % 2
+
+    return cubies_to_states(permutation_unrank(corner_ranks, 8), co, permutation_unrank(edge_ranks, 12), eo,
+                            CENTRE_ORIENTATIONS[orientation])
+
+
+def state_key(cube) -> int:
+    # Reversible key of a single cube, as a Python int of about 71 bits
+    corner_keys, edge_keys = encode_states(as_state(cube))
+    return int(corner_keys[0]) * EDGE_KEYS + int(edge_keys[0])
+
+
+def key_to_state(key: int) -> np.ndarray:
+    corner_key, edge_key = divmod(key, EDGE_KEYS)
+    return decode_keys(corner_key, edge_key)[0]
+
+
+def key_to_cube(key: int) -> dict:
+    return state_to_cube(key_to_state(key))
+
+
+def _splitmix(values: np.ndarray) -> np.ndarray:
+    values = values + SPLITMIX_INCREMENT
+    values = (values ^ (values >> np.uint64(30))) * SPLITMIX_FIRST
+    values = (values ^ (values >> np.uint64(27))) * SPLITMIX_SECOND
+    return values ^ (values >> np.uint64(31))
+
+
+def hash_keys(corner_keys: np.ndarray, edge_keys: np.ndarray) -> np.ndarray:
+    # Mix both halves of the keys into well spread 64 bit hashes
+    corner_keys = np.atleast_1d(np.asarray(corner_keys)).astype(np.uint64)
+    edge_keys = np.atleast_1d(np.asarray(edge_keys)).astype(np.uint64)
+    return _splitmix(_splitmix(corner_keys) ^ edge_keys)
+
+
+def state_hashes(states: np.ndarray) -> np.ndarray:
+    # 64 bit hash of every row of an (N, 54) array
+    return hash_keys(*encode_states(states))
+
+
+def state_hash(cube) -> int:
+    return int(state_hashes(as_state(cube))[0])
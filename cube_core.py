@@ -0,0 +1,429 @@
+import random
+
+import numpy as np
+
+from cube_profiler import profiled_deepcopy
+
+# Define possible moves
+MOVES = {"U", "D", "F", "B", "L", "R"}
+
+# Define colours for the cube
+COLOURS = {"Red": [255, 0, 0],
+           "Green": [0, 255, 0],
+           "Blue": [0, 0, 255],
+           "Yellow": [255, 255, 0],
+           "White": [255, 255, 255],
+           "Orange": [255, 128, 0]}
+
+# Define the starting colours of the cube
+START_CUBE = {
+        # Red Side (Front)
+        "F": {
+            "TL": "Red", "TM": "Red", "TR": "Red",
+            "ML": "Red", "MM": "Red", "MR": "Red",
+            "BL": "Red", "BM": "Red", "BR": "Red"
+            },
+
+        # Green Side (Left)
+        "L": {
+            "TL": "Green", "TM": "Green", "TR": "Green",
+            "ML": "Green", "MM": "Green", "MR": "Green",
+            "BL": "Green", "BM": "Green", "BR": "Green"
+            },
+
+        # White Side (Up)
+        "U": {
+            "TL": "White", "TM": "White", "TR": "White",
+            "ML": "White", "MM": "White", "MR": "White",
+            "BL": "White", "BM": "White", "BR": "White"
+            },
+
+        # Blue Side (Right)
+        "R": {
+            "TL": "Blue", "TM": "Blue", "TR": "Blue",
+            "ML": "Blue", "MM": "Blue", "MR": "Blue",
+            "BL": "Blue", "BM": "Blue", "BR": "Blue"
+            },
+
+        # Yellow Side (Down)
+        "D": {
+            "TL": "Yellow", "TM": "Yellow", "TR": "Yellow",
+            "ML": "Yellow", "MM": "Yellow", "MR": "Yellow",
+            "BL": "Yellow", "BM": "Yellow", "BR": "Yellow"
+            },
+
+        # Orange Side (Back)
+        "B": {
+            "TL": "Orange", "TM": "Orange", "TR": "Orange",
+            "ML": "Orange", "MM": "Orange", "MR": "Orange",
+            "BL": "Orange", "BM": "Orange", "BR": "Orange"
+            }
+        }
+
+# Define the neighbours of different cube faces
+CUBE_NEIGHBOURS = {
+                    "F":
+                    {
+                        "U": ["U", "BL", "BM", "BR"],
+                        "D": ["D", "TL", "TM", "TR"],
+                        "L": ["L", "TR", "MR", "BR"],
+                        "R": ["R", "TL", "ML", "BL"]
+                    },
+                    "B":
+                    {
+                        "U": ["U", "TR", "TM", "TL"],
+                        "D": ["D", "BR", "BM", "BL"],
+                        "L": ["R", "TR", "MR", "BR"],
+                        "R": ["L", "TL", "ML", "BL"]
+                    },
+                    "U":
+                    {
+                        "U": ["B", "TR", "TM", "TL"],
+                        "D": ["F", "TL", "TM", "TR"],
+                        "L": ["L", "TL", "TM", "TR"],
+                        "R": ["R", "TR", "TM", "TL"]
+                    },
+                    "D":
+                    {
+                        "U": ["F", "BL", "BM", "BR"],
+                        "D": ["B", "BR", "BM", "BL"],
+                        "L": ["L", "BR", "BM", "BL"],
+                        "R": ["R", "BL", "BM", "BR"]
+                    },
+                    "L":
+                    {
+                        "U": ["U", "TL", "ML", "BL"],
+                        "D": ["D", "BL", "ML", "TL"],
+                        "L": ["B", "TR", "MR", "BR"],
+                        "R": ["F", "TL", "ML", "BL"]
+                    },
+                    "R":
+                    {
+                        "U": ["U", "BR", "MR", "TR"],
+                        "D": ["D", "TR", "MR", "BR"],
+                        "L": ["F", "TR", "MR", "BR"],
+                        "R": ["B", "TL", "ML", "BL"]
+                    }
+                    }
+
+
+# Define the order faces, stickers and colours are stored in the array-backed cube state
+FACE_ORDER = ("F", "L", "U", "R", "D", "B")
+POSITIONS = ("TL", "TM", "TR", "ML", "MM", "MR", "BL", "BM", "BR")
+COLOUR_NAMES = tuple(COLOURS)
+COLOUR_CODES = {colour: code for code, colour in enumerate(COLOUR_NAMES)}
+COLOUR_VALUES = np.array([COLOURS[colour] for colour in COLOUR_NAMES], dtype=np.uint8)
+# Every colour has a different initial, so a state can be written as 54 letters
+COLOUR_LETTERS = "".join(colour[0] for colour in COLOUR_NAMES)
+
+
+# Define the face turns that make up each slice move
+SLICE_MOVES = {"M": ("L", "R'"),
+               "E": ("D'", "U"),
+               "S": ("B", "F'")}
+
+
+def sticker_index(face: str, position: str) -> int:
+    return FACE_ORDER.index(face) * len(POSITIONS) + POSITIONS.index(position)
+
+
+def cube_to_state(cube: dict) -> np.ndarray:
+    # Convert a dict-of-dicts cube into a 54 element array of colour codes
+    return np.array([COLOUR_CODES[cube[face][position]] for face in FACE_ORDER for position in POSITIONS],
+                    dtype=np.uint8)
+
+
+def state_to_cube(state: np.ndarray) -> dict:
+    # Convert a 54 element array of colour codes back into a dict-of-dicts cube
+    return {face: {position: COLOUR_NAMES[state[sticker_index(face, position)]] for position in POSITIONS}
+            for face in FACE_ORDER}
+
+
+def as_state(cube) -> np.ndarray:
+    # Accept either representation of the cube and return the array-backed state
+    if isinstance(cube, dict):
+        return cube_to_state(cube)
+    return cube
+
+
+def parse_state(text: str) -> np.ndarray:
+    # Read a state written as one colour initial per sticker, in FACE_ORDER and POSITIONS order
+    text = text.strip().upper()
+    if len(text) != len(FACE_ORDER) * len(POSITIONS) or any(letter not in COLOUR_LETTERS for letter in text):
+        raise ValueError(f"Expected {len(FACE_ORDER) * len(POSITIONS)} letters from {COLOUR_LETTERS}, got {text!r}")
+    return np.array([COLOUR_LETTERS.index(letter) for letter in text], dtype=np.uint8)
+
+
+def format_state(cube) -> str:
+    return "".join(COLOUR_LETTERS[code] for code in as_state(cube))
+
+
+def apply_move(cube, move: str) -> np.ndarray:
+    # A move is a single gather through its permutation table
+    return as_state(cube)[MOVE_TABLES[move]]
+
+
+def rotate_face(side: str, cube: dict) -> dict:
+    # one rotation clockwise
+    new_cube = profiled_deepcopy(cube)
+    # Face top row
+    new_cube[side]["TL"] = cube[side]["BL"]
+    new_cube[side]["TM"] = cube[side]["ML"]
+    new_cube[side]["TR"] = cube[side]["TL"]
+    # Face middle row
+    new_cube[side]["ML"] = cube[side]["BM"]
+    new_cube[side]["MM"] = cube[side]["MM"]
+    new_cube[side]["MR"] = cube[side]["TM"]
+    # Face bottom row
+    new_cube[side]["BL"] = cube[side]["BR"]
+    new_cube[side]["BM"] = cube[side]["MR"]
+    new_cube[side]["BR"] = cube[side]["TR"]
+    return new_cube
+
+
+def reverse_rotate_face(side: str, cube: dict) -> dict:
+    # one rotation anticlockwise
+    new_cube = profiled_deepcopy(cube)
+    # Face top row
+    new_cube[side]["TL"] = cube[side]["TR"]
+    new_cube[side]["TM"] = cube[side]["MR"]
+    new_cube[side]["TR"] = cube[side]["BR"]
+    # Face middle row
+    new_cube[side]["ML"] = cube[side]["TM"]
+    new_cube[side]["MM"] = cube[side]["MM"]
+    new_cube[side]["MR"] = cube[side]["BM"]
+    # Face bottom row
+    new_cube[side]["BL"] = cube[side]["TL"]
+    new_cube[side]["BM"] = cube[side]["ML"]
+    new_cube[side]["BR"] = cube[side]["BL"]
+    return new_cube
+
+
+def rotate_side_dict(side: str, cube: dict) -> dict:
+    # one rotation clockwise
+    neighbours_u = list(CUBE_NEIGHBOURS[side]["U"])
+    neighbours_d = list(CUBE_NEIGHBOURS[side]["D"])
+    neighbours_l = list(CUBE_NEIGHBOURS[side]["L"])
+    neighbours_r = list(CUBE_NEIGHBOURS[side]["R"])
+    new_cube = rotate_face(side, cube)
+    # Up
+    new_cube[neighbours_u[0]][neighbours_u[1]] = cube[neighbours_l[0]][neighbours_l[3]]
+    new_cube[neighbours_u[0]][neighbours_u[2]] = cube[neighbours_l[0]][neighbours_l[2]]
+    new_cube[neighbours_u[0]][neighbours_u[3]] = cube[neighbours_l[0]][neighbours_l[1]]
+    # Down
+    new_cube[neighbours_d[0]][neighbours_d[1]] = cube[neighbours_r[0]][neighbours_r[3]]
+    new_cube[neighbours_d[0]][neighbours_d[2]] = cube[neighbours_r[0]][neighbours_r[2]]
+    new_cube[neighbours_d[0]][neighbours_d[3]] = cube[neighbours_r[0]][neighbours_r[1]]
+    # Left
+    new_cube[neighbours_l[0]][neighbours_l[1]] = cube[neighbours_d[0]][neighbours_d[1]]
+    new_cube[neighbours_l[0]][neighbours_l[2]] = cube[neighbours_d[0]][neighbours_d[2]]
+    new_cube[neighbours_l[0]][neighbours_l[3]] = cube[neighbours_d[0]][neighbours_d[3]]
+    # Right
+    new_cube[neighbours_r[0]][neighbours_r[1]] = cube[neighbours_u[0]][neighbours_u[1]]
+    new_cube[neighbours_r[0]][neighbours_r[2]] = cube[neighbours_u[0]][neighbours_u[2]]
+    new_cube[neighbours_r[0]][neighbours_r[3]] = cube[neighbours_u[0]][neighbours_u[3]]
+    return new_cube
+
+
+def reverse_rotate_side_dict(side: str, cube: dict) -> dict:
+    # one rotation anticlockwise
+    neighbours_u = list(CUBE_NEIGHBOURS[side]["U"])
+    neighbours_d = list(CUBE_NEIGHBOURS[side]["D"])
+    neighbours_l = list(CUBE_NEIGHBOURS[side]["L"])
+    neighbours_r = list(CUBE_NEIGHBOURS[side]["R"])
+    new_cube = reverse_rotate_face(side, cube)
+    # Up
+    new_cube[neighbours_u[0]][neighbours_u[1]] = cube[neighbours_r[0]][neighbours_r[1]]
+    new_cube[neighbours_u[0]][neighbours_u[2]] = cube[neighbours_r[0]][neighbours_r[2]]
+    new_cube[neighbours_u[0]][neighbours_u[3]] = cube[neighbours_r[0]][neighbours_r[3]]
+    # Down
+    new_cube[neighbours_d[0]][neighbours_d[1]] = cube[neighbours_l[0]][neighbours_l[1]]
+    new_cube[neighbours_d[0]][neighbours_d[2]] = cube[neighbours_l[0]][neighbours_l[2]]
+    new_cube[neighbours_d[0]][neighbours_d[3]] = cube[neighbours_l[0]][neighbours_l[3]]
+    # Left
+    new_cube[neighbours_r[0]][neighbours_r[1]] = cube[neighbours_d[0]][neighbours_d[3]]
+    new_cube[neighbours_r[0]][neighbours_r[2]] = cube[neighbours_d[0]][neighbours_d[2]]
+    new_cube[neighbours_r[0]][neighbours_r[3]] = cube[neighbours_d[0]][neighbours_d[1]]
+    # Right
+    new_cube[neighbours_l[0]][neighbours_l[1]] = cube[neighbours_u[0]][neighbours_u[3]]
+    new_cube[neighbours_l[0]][neighbours_l[2]] = cube[neighbours_u[0]][neighbours_u[2]]
+    new_cube[neighbours_l[0]][neighbours_l[3]] = cube[neighbours_u[0]][neighbours_u[1]]
+    return new_cube
+
+
+def rotate_cube_x_dict(cube: dict) -> dict:
+    # rotate cube on x axis
+    new_cube = profiled_deepcopy(cube)
+    new_cube["F"] = cube["R"]
+    new_cube["R"] = cube["B"]
+    new_cube["B"] = cube["L"]
+    new_cube["L"] = cube["F"]
+    new_cube = rotate_face("U", new_cube)
+    new_cube = reverse_rotate_face("D", new_cube)
+    return new_cube
+
+
+def reverse_rotate_cube_x_dict(cube: dict) -> dict:
+    # rotate cube on x axis
+    new_cube = profiled_deepcopy(cube)
+    new_cube["F"] = cube["L"]
+    new_cube["L"] = cube["B"]
+    new_cube["B"] = cube["R"]
+    new_cube["R"] = cube["F"]
+    new_cube = reverse_rotate_face("U", new_cube)
+    new_cube = rotate_face("D", new_cube)
+    return new_cube
+
+
+def rotate_cube_y_dict(cube: dict) -> dict:
+    # rotate cube on y axis
+    new_cube = profiled_deepcopy(cube)
+    new_cube["R"] = cube["D"]
+    new_cube = reverse_rotate_face("R", new_cube)
+    new_cube["U"] = cube["R"]
+    new_cube = reverse_rotate_face("U", new_cube)
+    new_cube["L"] = cube["U"]
+    new_cube = reverse_rotate_face("L", new_cube)
+    new_cube["D"] = cube["L"]
+    new_cube = reverse_rotate_face("D", new_cube)
+    new_cube = rotate_face("B", new_cube)
+    new_cube = reverse_rotate_face("F", new_cube)
+    return new_cube
+
+
+def reverse_rotate_cube_y_dict(cube: dict) -> dict:
+    # rotate cube on y axis
+    new_cube = profiled_deepcopy(cube)
+    new_cube["R"] = cube["U"]
+    new_cube = rotate_face("R", new_cube)
+    new_cube["U"] = cube["L"]
+    new_cube = rotate_face("U", new_cube)
+    new_cube["L"] = cube["D"]
+    new_cube = rotate_face("L", new_cube)
+    new_cube["D"] = cube["R"]
+    new_cube = rotate_face("D", new_cube)
+    new_cube = reverse_rotate_face("B", new_cube)
+    new_cube = rotate_face("F", new_cube)
+    return new_cube
+
+
+def build_move_tables() -> dict:
+    # Run the dict moves on a cube labelled with sticker indices to read off each permutation
+    labelled_cube = {face: {position: sticker_index(face, position) for position in POSITIONS}
+                     for face in FACE_ORDER}
+
+    def table(cube: dict) -> np.ndarray:
+        return np.array([cube[face][position] for face in FACE_ORDER for position in POSITIONS], dtype=np.intp)
+
+    tables = dict()
+    for side in sorted(MOVES):
+        tables[side] = table(rotate_side_dict(side, labelled_cube))
+        tables[side + "'"] = table(reverse_rotate_side_dict(side, labelled_cube))
+    tables["RCX"] = table(rotate_cube_x_dict(labelled_cube))
+    tables["RCX'"] = table(reverse_rotate_cube_x_dict(labelled_cube))
+    tables["RCY"] = table(rotate_cube_y_dict(labelled_cube))
+    tables["RCY'"] = table(reverse_rotate_cube_y_dict(labelled_cube))
+    for move, (first, second) in SLICE_MOVES.items():
+        tables[move] = tables[first][tables[second]]
+        tables[move + "'"] = np.argsort(tables[move])
+    # Half turns are a quarter turn applied twice
+    for move in list(tables):
+        if not move.endswith("'"):
+            tables[move + "2"] = tables[move][tables[move]]
+    return tables
+
+
+# Precompute the permutation for every move so applying one is a single gather
+MOVE_TABLES = build_move_tables()
+SOLVED_STATE = cube_to_state(START_CUBE)
+
+# Number every move so batches can pick a permutation per row
+MOVE_NAMES = tuple(MOVE_TABLES)
+MOVE_CODES = {move: code for code, move in enumerate(MOVE_NAMES)}
+MOVE_TABLE_ARRAY = np.stack([MOVE_TABLES[move] for move in MOVE_NAMES])
+
+
+def move_codes(moves) -> np.ndarray:
+    # Accept move names or move codes and return an array of move codes
+    moves = np.asarray(moves)
+    if moves.dtype.kind in "iu":
+        return moves.astype(np.intp, copy=False)
+    return np.vectorize(MOVE_CODES.__getitem__, otypes=[np.intp])(moves)
+
+
+def compose_moves(moves) -> np.ndarray:
+    # Fold a sequence of moves into the single permutation that applies them all
+    table = np.arange(len(SOLVED_STATE))
+    for move in moves:
+        table = table[MOVE_TABLES[move]]
+    return table
+
+
+def apply_move_batch(states: np.ndarray, moves) -> np.ndarray:
+    # Apply one move to every row of an (N, 54) array, or one move per row when given N moves
+    states = np.asarray(states)
+    if isinstance(moves, str):
+        return states[:, MOVE_TABLES[moves]]
+    return np.take_along_axis(states, MOVE_TABLE_ARRAY[move_codes(moves)], axis=1)
+
+
+def apply_sequence_batch(states: np.ndarray, moves) -> np.ndarray:
+    # Apply a sequence shared by every row, or an (N, L) array with one sequence per row
+    states = np.asarray(states)
+    if isinstance(moves, str):
+        return states[:, MOVE_TABLES[moves]]
+    codes = move_codes(moves)
+    if codes.ndim == 1:
+        return states[:, compose_moves(MOVE_NAMES[code] for code in codes)]
+    for column in range(codes.shape[1]):
+        states = np.take_along_axis(states, MOVE_TABLE_ARRAY[codes[:, column]], axis=1)
+    return states
+
+
+def apply_moves(cube, moves) -> np.ndarray:
+    # Apply a whole sequence of moves with one gather
+    return as_state(cube)[compose_moves(moves)]
+
+
+def move_name(move: str, direction: str) -> str:
+    # Convert a cube_rotation style move and direction into move notation
+    if direction == "CC":
+        return move + "'"
+    return move
+
+
+def split_move(move: str) -> tuple:
+    # Convert a quarter turn in move notation back into a cube_rotation style move and direction
+    if move.endswith("'"):
+        return move[:-1], "CC"
+    return move, "C"
+
+
+def quarter_turns(moves) -> list:
+    # Expand half turns into two quarter turns so every move maps onto a cube_rotation call
+    turns = []
+    for move in moves:
+        if move.endswith("2"):
+            turns.extend([move[:-1], move[:-1]])
+        else:
+            turns.append(move)
+    return turns
+
+
+def inverse_move(move: str) -> str:
+    if move.endswith("'"):
+        return move[:-1]
+    if move.endswith("2"):
+        return move
+    return move + "'"
+
+
+def inverse_moves(moves) -> list:
+    # The moves that undo a sequence, in the order they should be applied
+    return [inverse_move(move) for move in reversed(list(moves))]
+
+
+def random_moves(count: int = 100) -> list:
+    # Pick random quarter turns of the outer faces
+    moves_list = sorted(MOVES)
+    return [move_name(random.choice(moves_list), random.choice(["C", "CC"])) for _ in range(count)]
@@ -0,0 +1,200 @@
+import numpy as np
+
+from cube_core import FACE_ORDER, MOVES, MOVE_TABLES, SOLVED_STATE, COLOUR_NAMES, sticker_index
+
+# Define the corner pieces and their stickers, starting with the U/D sticker and going clockwise
+CORNERS = ("URF", "UFL", "ULB", "UBR", "DFR", "DLF", "DBL", "DRB")
+CORNER_FACELETS = {"URF": [("U", "BR"), ("R", "TL"), ("F", "TR")],
+                   "UFL": [("U", "BL"), ("F", "TL"), ("L", "TR")],
+                   "ULB": [("U", "TL"), ("L", "TL"), ("B", "TR")],
+                   "UBR": [("U", "TR"), ("B", "TL"), ("R", "TR")],
+                   "DFR": [("D", "TR"), ("F", "BR"), ("R", "BL")],
+                   "DLF": [("D", "TL"), ("L", "BR"), ("F", "BL")],
+                   "DBL": [("D", "BL"), ("B", "BR"), ("L", "BL")],
+                   "DRB": [("D", "BR"), ("R", "BR"), ("B", "BL")]}
+
+# Define the edge pieces and their stickers, starting with the U/D sticker or else the F/B sticker
+EDGES = ("UR", "UF", "UL", "UB", "DR", "DF", "DL", "DB", "FR", "FL", "BL", "BR")
+EDGE_FACELETS = {"UR": [("U", "MR"), ("R", "TM")],
+                 "UF": [("U", "BM"), ("F", "TM")],
+                 "UL": [("U", "ML"), ("L", "TM")],
+                 "UB": [("U", "TM"), ("B", "TM")],
+                 "DR": [("D", "MR"), ("R", "BM")],
+                 "DF": [("D", "TM"), ("F", "BM")],
+                 "DL": [("D", "ML"), ("L", "BM")],
+                 "DB": [("D", "BM"), ("B", "BM")],
+                 "FR": [("F", "MR"), ("R", "ML")],
+                 "FL": [("F", "ML"), ("L", "MR")],
+                 "BL": [("B", "MR"), ("L", "ML")],
+                 "BR": [("B", "ML"), ("R", "MR")]}
+
+# Sticker indices of every corner, edge and centre in the array-backed state
+CORNER_STICKERS = np.array([[sticker_index(face, position) for face, position in CORNER_FACELETS[corner]]
+                            for corner in CORNERS], dtype=np.intp)
+EDGE_STICKERS = np.array([[sticker_index(face, position) for face, position in EDGE_FACELETS[edge]]
+                          for edge in EDGES], dtype=np.intp)
+CENTRE_STICKERS = np.array([sticker_index(face, "MM") for face in FACE_ORDER], dtype=np.intp)
+
+# Faces each piece shows when solved, as indices into FACE_ORDER
+CORNER_FACES = np.array([[FACE_ORDER.index(face) for face in corner] for corner in CORNERS], dtype=np.intp)
+EDGE_FACES = np.array([[FACE_ORDER.index(face) for face in edge] for edge in EDGES], dtype=np.intp)
+
+# Faces a piece shows on the stickers of its position for every orientation, as [piece, orientation, sticker]
+# Sticker k of a piece sits on sticker k + orientation of its position
+ORIENTED_CORNER_FACES = CORNER_FACES[:, (np.arange(3)[None, :] - np.arange(3)[:, None]) % 3].astype(np.uint8)
+ORIENTED_EDGE_FACES = EDGE_FACES[:, (np.arange(2)[None, :] - np.arange(2)[:, None]) % 2].astype(np.uint8)
+
+# Where each sticker lands when the centres, corners and edges are listed one after another
+PIECE_STICKER_ORDER = np.argsort(np.concatenate([CENTRE_STICKERS, CORNER_STICKERS.ravel(), EDGE_STICKERS.ravel()]))
+
+
+def _centre_orientations() -> np.ndarray:
+    # Centre colours of the 24 ways the whole cube can be held, found by turning it with RCX and RCY
+    states = [SOLVED_STATE]
+    for state in states:
+        for move in ("RCX", "RCY"):
+            turned = state[MOVE_TABLES[move]]
+            if not any((turned == known).all() for known in states):
+                states.append(turned)
+    return np.array([state[CENTRE_STICKERS] for state in states], dtype=np.uint8)
+
+
+CENTRE_ORIENTATIONS = _centre_orientations()
+# Look up an orientation from the colours of its first two centres
+ORIENTATION_LOOKUP = np.full((len(FACE_ORDER), len(FACE_ORDER)), -1, dtype=np.int64)
+ORIENTATION_LOOKUP[CENTRE_ORIENTATIONS[:, 0], CENTRE_ORIENTATIONS[:, 1]] = np.arange(len(CENTRE_ORIENTATIONS))
+
+
+# Face code for a sticker whose colour no centre has, so the lookups below need no separate check for it
+NO_FACE = len(FACE_ORDER)
+
+
+def _piece_lookups() -> tuple:
+    # Map the faces shown by a corner or an edge to the piece and its twist or flip, with -1 where no piece exists
+    # Codes count in base NO_FACE + 1, so a sticker with no face lands on an entry that is no piece
+    base = NO_FACE + 1
+    corner_pieces = np.full(base ** 3, -1, dtype=np.intp)
+    corner_twists = np.zeros(base ** 3, dtype=np.intp)
+    for corner, twists in enumerate(ORIENTED_CORNER_FACES.astype(np.intp)):
+        for twist, (first, second, third) in enumerate(twists):
+            corner_pieces[(first * base + second) * base + third] = corner
+            corner_twists[(first * base + second) * base + third] = twist
+    edge_pieces = np.full(base ** 2, -1, dtype=np.intp)
+    edge_flips = np.zeros(base ** 2, dtype=np.intp)
+    for edge, (first, second) in enumerate(EDGE_FACES):
+        edge_pieces[[first * base + second, second * base + first]] = edge
+        edge_flips[second * base + first] = 1
+    return corner_pieces, corner_twists, edge_pieces, edge_flips
+
+
+CORNER_PIECES, CORNER_TWISTS, EDGE_PIECES, EDGE_FLIPS = _piece_lookups()
+
+
+def _sticker_faces(states: np.ndarray) -> np.ndarray:
+    # Replace each sticker colour with the face whose centre has that colour, NO_FACE if no centre does
+    # A flat gather with small integers, since this runs over every sticker of every state
+    states = np.atleast_2d(states)
+    face_of_colour = np.full((len(states), len(COLOUR_NAMES)), NO_FACE, dtype=np.int16)
+    face_of_colour[np.arange(len(states))[:, None], states[:, CENTRE_STICKERS]] = np.arange(len(FACE_ORDER))
+    rows = np.arange(0, face_of_colour.size, len(COLOUR_NAMES), dtype=np.int32)[:, None]
+    return face_of_colour.ravel()[states + rows]
+
+
+def state_faces(states: np.ndarray) -> np.ndarray:
+    # Replace each sticker colour with the face whose centre has that colour, -1 if no centre does
+    faces = _sticker_faces(states).astype(np.intp)
+    faces[faces == NO_FACE] = -1
+    return faces
+
+
+def states_to_cubies(states: np.ndarray) -> tuple:
+    # Read the corner and edge permutation and orientation of every row of an (N, 54) array
+    # Pieces that cannot exist on a real cube are reported as -1 in the permutation
+    faces = _sticker_faces(states)
+    base = NO_FACE + 1
+
+    corner_faces = faces[:, CORNER_STICKERS]
+    corner_codes = (corner_faces[..., 0] * base + corner_faces[..., 1]) * base + corner_faces[..., 2]
+    edge_faces = faces[:, EDGE_STICKERS]
+    edge_codes = edge_faces[..., 0] * base + edge_faces[..., 1]
+    return CORNER_PIECES[corner_codes], CORNER_TWISTS[corner_codes], EDGE_PIECES[edge_codes], EDGE_FLIPS[edge_codes]
+
+
+def state_to_cubies(state: np.ndarray) -> tuple:
+    cp, co, ep, eo = states_to_cubies(state)
+    return cp[0], co[0], ep[0], eo[0]
+
+
+def cubies_to_states(cp: np.ndarray, co: np.ndarray, ep: np.ndarray, eo: np.ndarray,
+                     centres: np.ndarray | None = None) -> np.ndarray:
+    # Build (N, 54) states from corner and edge permutations and orientations
+    # The centre colours of each row, in FACE_ORDER, give its orientation and default to the solved one
+    cp, co, ep, eo = (np.atleast_2d(np.asarray(array, dtype=np.intp)) for array in (cp, co, ep, eo))
+    rows = len(cp)
+    # Lay the centre, corner and edge stickers side by side, then put them in state order with one gather
+    pieces = np.empty((rows, len(SOLVED_STATE)), dtype=np.uint8)
+    pieces[:, :len(FACE_ORDER)] = np.arange(len(FACE_ORDER))
+    corners = np.take(ORIENTED_CORNER_FACES.reshape(-1, 3), cp * 3 + co, axis=0).reshape(rows, -1)
+    pieces[:, len(FACE_ORDER):len(FACE_ORDER) + corners.shape[1]] = corners
+    pieces[:, len(FACE_ORDER) + corners.shape[1]:] = np.take(ORIENTED_EDGE_FACES.reshape(-1, 2), ep * 2 + eo,
+                                                             axis=0).reshape(rows, -1)
+    faces = np.take(pieces, PIECE_STICKER_ORDER, axis=1)
+    if centres is None:
+        return np.take(SOLVED_STATE[CENTRE_STICKERS], faces)
+    face_colours = np.broadcast_to(np.asarray(centres, dtype=np.uint8), (rows, len(FACE_ORDER)))
+    return np.take_along_axis(face_colours, faces.astype(np.intp), axis=1)
+
+
+def permutation_rank(perms: np.ndarray) -> np.ndarray:
+    # Lehmer code rank of every row, with the identity ranked 0
+    perms = np.atleast_2d(perms)
+    size = perms.shape[1]
+    ranks = np.zeros(len(perms), dtype=np.int64)
+    for position in range(size):
+        smaller = (perms[:, position + 1:] < perms[:, position:position + 1]).sum(axis=1)
+        ranks = ranks * (size - position) + smaller
+    return ranks
+
+
+def permutation_unrank(ranks: np.ndarray, size: int) -> np.ndarray:
+    # Inverse of permutation_rank, returning one permutation of range(size) per rank
+    ranks = np.atleast_1d(np.asarray(ranks, dtype=np.int64)).copy()
+    digits = np.empty((len(ranks), size), dtype=np.intp)
+    for position in range(size - 1, -1, -1):
+        ranks, digits[:, position] = np.divmod(ranks, size - position)
+    perms = np.empty((len(ranks), size), dtype=np.intp)
+    remaining = np.tile(np.arange(size), (len(ranks), 1))
+    rows = np.arange(len(ranks))
+    for position in range(size):
+        perms[:, position] = remaining[rows, digits[:, position]]
+        keep = np.ones(remaining.shape, dtype=bool)
+        keep[rows, digits[:, position]] = False
+        remaining = remaining[keep].reshape(len(ranks), size - position - 1)
+    return perms
+
+
+def permutation_parity(perms: np.ndarray) -> np.ndarray:
+    # 0 for even permutations and 1 for odd ones, counted by inversions over every pair of positions
+    perms = np.atleast_2d(perms)
+    first, second = np.triu_indices(perms.shape[1], 1)
+    small = perms.astype(np.int8) if perms.shape[1] <= np.iinfo(np.int8).max else perms
+    return np.count_nonzero(small[:, first] > small[:, second], axis=1) % 2
+
+
+def build_move_cubies() -> dict:
+    # Read the effect of every face turn on the pieces from its sticker permutation
+    move_cubies = dict()
+    for side in sorted(MOVES):
+        for move in (side, side + "2", side + "'"):
+            move_cubies[move] = state_to_cubies(SOLVED_STATE[MOVE_TABLES[move]])
+    return move_cubies
+
+
+MOVE_CUBIES = build_move_cubies()
+
+
+def apply_cubie_move(cubies: tuple, move: str) -> tuple:
+    # Apply a face turn to a corner and edge permutation and orientation
+    cp, co, ep, eo = cubies
+    move_cp, move_co, move_ep, move_eo = MOVE_CUBIES[move]
+    return cp[move_cp], (co[move_cp] + move_co) % 3, ep[move_ep], (eo[move_ep] + move_eo) % 2
@@ -0,0 +1,146 @@
+import itertools
+import json
+import shutil
+import struct
+import tempfile
+from array import array
+
+import numpy as np
+
+from cube_core import MOVE_CODES, MOVE_NAMES, SOLVED_STATE, as_state, state_to_cube
+
+# Layout of a states file, every section starting on a 64 byte boundary:
+#   header: 8 byte magic, uint32 version, uint32 bytes per state, uint64 state count,
+#           uint64 offsets of the states, move index, move data and move names, uint64 length of the move names
+#   states: count packed states of STATE_BYTES each, 3 bits per sticker colour code
+#   move index: count + 1 uint64 offsets into the move data, so record i's moves are data[index[i]:index[i + 1]]
+#   move data: one uint8 move code per move
+#   move names: JSON list of the move names the codes index, so files outlive changes to the move list
+STATES_MAGIC = b"RCSTATES"
+STATES_VERSION = 1
+STATES_HEADER = struct.Struct("<8sIIQQQQQQ")
+STATES_ALIGNMENT = 64
+
+BITS_PER_STICKER = 3
+STATE_BYTES = -(-len(SOLVED_STATE) * BITS_PER_STICKER // 8)
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // STATES_ALIGNMENT) * STATES_ALIGNMENT
+
+
+def pack_states(states: np.ndarray) -> np.ndarray:
+    # Pack (N, 54) colour codes into (N, 21) bytes
+    states = np.atleast_2d(states).astype(np.uint8)
+    bits = np.unpackbits(states[..., None], axis=2)[..., -BITS_PER_STICKER:]
+    return np.packbits(bits.reshape(len(states), -1), axis=1)
+
+
+def unpack_states(packed: np.ndarray) -> np.ndarray:
+    packed = np.atleast_2d(packed)
+    bits = np.unpackbits(packed, axis=1, count=len(SOLVED_STATE) * BITS_PER_STICKER)
+    bits = bits.reshape(len(packed), len(SOLVED_STATE), BITS_PER_STICKER)
+    return (bits[..., 0] << 2 | bits[..., 1] << 1 | bits[..., 2]).astype(np.uint8)
+
+
+class StateFileWriter:
+    # Append states, each with an optional move sequence, then write the index when closed
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(bytes(_aligned(STATES_HEADER.size)))
+        self.count = 0
+        self.index = array("Q", [0])
+        # Move data is collected separately because the index has to come first
+        self.moves = tempfile.TemporaryFile()
+
+    def write(self, states, moves=None):
+        # Add one state or an (N, 54) array, with a list of move lists to go with them
+        states = np.atleast_2d(as_state(states))
+        if moves is not None and len(moves) != len(states):
+            raise ValueError(f"Got {len(states)} states but {len(moves)} move sequences")
+        # A streaming producer can hand over an empty chunk, which has nothing to pack
+        if not len(states):
+            return
+        self.file.write(pack_states(states).tobytes())
+        self.count += len(states)
+        if moves is None:
+            self.index.extend(itertools.repeat(self.index[-1], len(states)))
+            return
+        for sequence in moves:
+            codes = bytes(MOVE_CODES[move] for move in sequence)
+            self.moves.write(codes)
+            self.index.append(self.index[-1] + len(codes))
+
+    def close(self):
+        if self.file is None:
+            return
+        index_offset = _aligned(self.file.tell())
+        self.file.seek(index_offset)
+        self.file.write(self.index.tobytes())
+        moves_offset = _aligned(self.file.tell())
+        self.file.seek(moves_offset)
+        self.moves.seek(0)
+        shutil.copyfileobj(self.moves, self.file)
+        self.moves.close()
+        names = json.dumps(MOVE_NAMES).encode()
+        names_offset = _aligned(self.file.tell())
+        self.file.seek(names_offset)
+        self.file.write(names)
+        self.file.seek(0)
+        self.file.write(STATES_HEADER.pack(STATES_MAGIC, STATES_VERSION, STATE_BYTES, self.count,
+                                           _aligned(STATES_HEADER.size), index_offset, moves_offset,
+                                           names_offset, len(names)))
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+class StateFile:
+    # Memory-mapped reader, so any state or slice of states is read without parsing the rest of the file
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            header = file.read(STATES_HEADER.size)
+            (magic, version, state_bytes, count, states_offset, index_offset, moves_offset,
+             names_offset, names_length) = STATES_HEADER.unpack(header)
+            if magic != STATES_MAGIC:
+                raise ValueError(f"{path} is not a cube states file")
+            if version != STATES_VERSION:
+                raise ValueError(f"{path} has states format version {version}, expected {STATES_VERSION}")
+            if state_bytes != STATE_BYTES:
+                raise ValueError(f"{path} has {state_bytes} byte states, expected {STATE_BYTES}")
+            file.seek(names_offset)
+            self.move_names = json.loads(file.read(names_length))
+        self.count = count
+        self.packed = np.memmap(path, dtype=np.uint8, mode="r", offset=states_offset, shape=(count, STATE_BYTES))
+        self.index = np.memmap(path, dtype="<u8", mode="r", offset=index_offset, shape=(count + 1,))
+        total_moves = int(self.index[-1])
+        self.move_data = np.memmap(path, dtype=np.uint8, mode="r", offset=moves_offset, shape=(total_moves,))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, item) -> np.ndarray:
+        # A single state for an integer, or an (N, 54) array for a slice or an array of indices
+        if isinstance(item, (int, np.integer)):
+            return unpack_states(self.packed[item])[0]
+        return unpack_states(self.packed[item])
+
+    def cube(self, item: int) -> dict:
+        return state_to_cube(self[item])
+
+    def move_codes(self, item: int) -> np.ndarray:
+        return self.move_data[self.index[item]:self.index[item + 1]]
+
+    def moves(self, item: int) -> list:
+        return [self.move_names[code] for code in self.move_codes(item)]
+
+
+def write_state_file(path: str, states, moves=None):
+    with StateFileWriter(path) as writer:
+        writer.write(states, moves)
@@ -0,0 +1,62 @@
+import functools
+
+import numpy as np
+
+import nxn_cube
+
+# Whole-cube turns, which only change the orientation the cube is seen in
+ROTATION_MOVES = ("RCX", "RCX'", "RCX2", "RCY", "RCY'", "RCY2")
+
+# The orientation of a cube that has never been turned as a whole
+IDENTITY = 0
+
+
+@functools.lru_cache(maxsize=None)
+def orientation_tables(n: int) -> tuple:
+    # The sticker table of each of the 24 orientations as every product of RCX and RCY, with the identity first,
+    # the orientation each whole-cube turn leads to from every orientation, and the move every move becomes
+    # between the stored cube and the cube as seen, for every orientation
+    tables = [np.arange(6 * n * n)]
+    for table in tables:
+        for move in ("RCX", "RCY"):
+            turned = table[nxn_cube.move_table(n, move)]
+            if not any((turned == known).all() for known in tables):
+                tables.append(turned)
+    tables = np.array(tables, dtype=np.intp)
+    lookup = {table.tobytes(): orientation for orientation, table in enumerate(tables)}
+    rotations = [{move: lookup[table[nxn_cube.move_table(n, move)].tobytes()] for move in ROTATION_MOVES}
+                 for table in tables]
+
+    names = [move for move in nxn_cube.move_names(n) if move not in ROTATION_MOVES]
+    codes = {nxn_cube.move_table(n, move).tobytes(): move for move in names}
+    to_cube = []
+    for table, inverse in zip(tables, np.argsort(tables, axis=1)):
+        # Turning the seen cube by a move turns the stored cube by the move conjugated by the orientation
+        to_cube.append({move: codes[table[nxn_cube.move_table(n, move)][inverse].tobytes()] for move in names})
+    to_view = [{cube_move: move for move, cube_move in moves.items()} for moves in to_cube]
+    return tables, rotations, to_cube, to_view
+
+
+def rotate(n: int, orientation: int, move: str) -> int:
+    # The orientation after a whole-cube turn, without touching any stickers
+    return orientation_tables(n)[1][orientation][move]
+
+
+def cube_move(n: int, orientation: int, move: str) -> str:
+    # The move to make on the stored cube for a move made on the cube as seen
+    return orientation_tables(n)[2][orientation][move]
+
+
+def view_move(n: int, orientation: int, move: str) -> str:
+    # The move as seen for a move made on the stored cube, such as a solver's solution
+    return orientation_tables(n)[3][orientation][move]
+
+
+def view_table(n: int, orientation: int) -> np.ndarray:
+    # The stored sticker shown at every sticker of the cube as seen
+    return orientation_tables(n)[0][orientation]
+
+
+def view_state(n: int, orientation: int, state: np.ndarray) -> np.ndarray:
+    # Relabel the stickers once, for drawing or exporting the cube as seen
+    return state[..., view_table(n, orientation)]
@@ -0,0 +1,134 @@
+import collections
+import copy
+import functools
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+# Instrumented functions check this once per call, so leaving profiling off costs a single global lookup
+enabled = False
+
+# Timings kept per function for percentiles, so a long session cannot grow the profile without bound
+SAMPLE_LIMIT = 10000
+
+# Call statistics by name, and plain counters such as renders and deepcopies
+call_stats = dict()
+counters = collections.Counter()
+
+
+class CallStats:
+    __slots__ = ("count", "total", "allocated", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.allocated = 0
+        self.samples = collections.deque(maxlen=SAMPLE_LIMIT)
+
+    def add(self, seconds: float, allocated: int = 0):
+        self.count += 1
+        self.total += seconds
+        self.allocated += allocated
+        self.samples.append(seconds)
+
+
+def profiled_deepcopy(value):
+    # The project's own deepcopies go through here to be counted, leaving the copy module alone for everyone else
+    if enabled:
+        counters["deepcopy"] += 1
+    return copy.deepcopy(value)
+
+
+def enable(allocations: bool = False):
+    # Start recording, optionally tracing memory so every call also reports the bytes it left allocated
+    global enabled
+    enabled = True
+    if allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global enabled
+    enabled = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def reset():
+    call_stats.clear()
+    counters.clear()
+
+
+def record(name: str, seconds: float, allocated: int = 0):
+    # Add a timing measured elsewhere, such as a solve that ran in another process
+    if enabled:
+        if name not in call_stats:
+            call_stats[name] = CallStats()
+        call_stats[name].add(seconds, allocated)
+
+
+def count(name: str, amount: int = 1):
+    if enabled:
+        counters[name] += amount
+
+
+def profiled(name: str | None = None):
+    # Time every call of the decorated function while profiling is enabled
+    def decorator(function):
+        label = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            tracing = tracemalloc.is_tracing()
+            before = tracemalloc.get_traced_memory()[0] if tracing else 0
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                allocated = tracemalloc.get_traced_memory()[0] - before if tracing else 0
+                record(label, seconds, allocated)
+        return wrapper
+    return decorator
+
+
+def report() -> dict:
+    # Counts, cumulative time and percentiles of the recent calls of every instrumented function
+    calls = dict()
+    for name, stats in call_stats.items():
+        samples = np.fromiter(stats.samples, dtype=np.float64)
+        p50, p90, p99 = np.percentile(samples, [50, 90, 99]) if len(samples) else (0.0, 0.0, 0.0)
+        calls[name] = {"count": stats.count,
+                       "total": stats.total,
+                       "mean": stats.total / stats.count,
+                       "p50": float(p50),
+                       "p90": float(p90),
+                       "p99": float(p99),
+                       "max": float(samples.max()) if len(samples) else 0.0,
+                       "allocated_bytes": stats.allocated}
+    return {"enabled": enabled, "calls": calls, "counters": dict(counters)}
+
+
+def dump(path: str):
+    with open(path, "w") as file:
+        json.dump(report(), file, indent=2)
+
+
+def summary() -> str:
+    # A few lines for the stats overlay, slowest functions first
+    profile = report()
+    lines = [f"{name[:24]:24} {stats['count']:7} {stats['p50'] * 1000:8.3f} {stats['p99'] * 1000:8.3f}"
+             for name, stats in sorted(profile["calls"].items(), key=lambda item: -item[1]["total"])]
+    lines.insert(0, f"{'function':24} {'calls':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    lines.extend(f"{name}: {value}" for name, value in sorted(profile["counters"].items()))
+    return "\n".join(lines)
+
+
+# Allow profiling a whole session from startup without touching the code
+if os.environ.get("RUBIK_CUBE_PROFILE"):
+    enable(allocations=os.environ["RUBIK_CUBE_PROFILE"] == "allocations")
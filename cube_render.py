@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import argparse
+import collections
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import rubik_cube
+from batch_solve import read_scramble
+from cube_core import SOLVED_STATE
+from cube_format import STATES_MAGIC, StateFile
+
+# Camera directions from the cube's centre and the way up, in the mesh's coordinates (x right, y back, z up)
+CAMERA_PRESETS = {"front": ((0, -1, 0), (0, 0, 1)),
+                  "back": ((0, 1, 0), (0, 0, 1)),
+                  "top": ((0, 0, 1), (0, 1, 0)),
+                  "bottom": ((0, 0, -1), (0, -1, 0)),
+                  "iso": ((1, -1, 1), (0, 0, 1)),
+                  "iso-back": ((-1, 1, -1), (0, 0, 1))}
+DEFAULT_PRESETS = ("iso",)
+CAMERA_ZOOM = 0.9
+
+DEFAULT_IMAGE_SIZE = (512, 512)
+
+# Images waiting to be written per writer thread, which bounds memory however many states there are
+IMAGES_PER_WRITER = 4
+
+
+def read_states(path: str):
+    # Yield (number, state) for a packed states file, or for each line of 54 colour initials or moves
+    if path != "-":
+        with open(path, "rb") as file:
+            packed = file.read(len(STATES_MAGIC)) == STATES_MAGIC
+        if packed:
+            states = StateFile(path)
+            for start in range(0, len(states), 1024):
+                for offset, state in enumerate(states[start:start + 1024]):
+                    yield start + offset, state
+            return
+    source = sys.stdin if path == "-" else open(path)
+    try:
+        number = 0
+        for text in source:
+            if not text.strip() or text.lstrip().startswith("#"):
+                continue
+            yield number, read_scramble(text)
+            number += 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+
+def save_png(path: str, image: np.ndarray):
+    from PIL import Image
+    Image.fromarray(image).save(path)
+
+
+class CubeRenderer:
+    # One offscreen plotter and one mesh, recoloured in place for every state
+    def __init__(self, size: tuple = DEFAULT_IMAGE_SIZE, background: str = "white"):
+        import pyvista as pv
+        self.plotter = pv.Plotter(off_screen=True, window_size=list(size))
+        self.plotter.set_background(background)
+        self.mesh = rubik_cube.generate_mesh(SOLVED_STATE)
+        self.plotter.add_mesh(self.mesh, scalars='colors', lighting=False, rgb=True, preference='cell',
+                              show_edges=True, line_width=2)
+        self.centre = np.array(self.mesh.center)
+        self.cameras = dict()
+        self.preset = None
+
+    def set_camera(self, preset: str):
+        # Framing a preset takes several renders, so each one is framed once and its camera reused after that
+        if preset == self.preset:
+            return
+        camera = self.plotter.renderer.GetActiveCamera()
+        if preset in self.cameras:
+            position, focal_point, view_up, view_angle, clipping_range = self.cameras[preset]
+            camera.SetPosition(position)
+            camera.SetFocalPoint(focal_point)
+            camera.SetViewUp(view_up)
+            camera.SetViewAngle(view_angle)
+            camera.SetClippingRange(clipping_range)
+        else:
+            direction, view_up = CAMERA_PRESETS[preset]
+            direction = np.array(direction, dtype=np.float64) / np.linalg.norm(direction)
+            self.plotter.camera_position = [tuple(self.centre + direction), tuple(self.centre), view_up]
+            # Back the camera off until the whole cube fits with a margin, the same distance for every state
+            self.plotter.reset_camera()
+            self.plotter.camera.zoom(CAMERA_ZOOM)
+            self.cameras[preset] = (camera.GetPosition(), camera.GetFocalPoint(), camera.GetViewUp(),
+                                    camera.GetViewAngle(), camera.GetClippingRange())
+        self.preset = preset
+
+    def render(self, state: np.ndarray, preset: str = "iso") -> np.ndarray:
+        # An (H, W, 3) image of the state from a camera preset
+        rubik_cube.colour_mesh(self.mesh, state)
+        self.set_camera(preset)
+        # The screenshot reuses the last frame unless the plotter draws a new one first
+        self.plotter.render()
+        return self.plotter.screenshot(return_img=True)
+
+    def close(self):
+        self.plotter.close()
+
+
+def render_states(states, directory: str, presets=DEFAULT_PRESETS, size: tuple = DEFAULT_IMAGE_SIZE,
+                  writers: int | None = None) -> int:
+    # Render every (number, state) to PNGs named by number and preset, compressing and writing them on threads
+    # while the next state renders. Returns the number of images written
+    os.makedirs(directory, exist_ok=True)
+    writers = writers or os.cpu_count() or 1
+    renderer = CubeRenderer(size)
+    written = 0
+    try:
+        with ThreadPoolExecutor(max_workers=writers) as executor:
+            pending = collections.deque()
+            for number, state in states:
+                for preset in presets:
+                    suffix = f"_{preset}" if len(presets) > 1 else ""
+                    path = os.path.join(directory, f"{number:06d}{suffix}.png")
+                    pending.append(executor.submit(save_png, path, renderer.render(state, preset)))
+                    if len(pending) >= writers * IMAGES_PER_WRITER:
+                        pending.popleft().result()
+                        written += 1
+            while pending:
+                pending.popleft().result()
+                written += 1
+    finally:
+        renderer.close()
+    return written
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Render cube states to PNG images without a window.")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="packed states file, or one state per line as moves or 54 colour initials "
+                             "(default: stdin)")
+    parser.add_argument("-o", "--output", required=True, help="directory to write the images to")
+    parser.add_argument("--presets", default=",".join(DEFAULT_PRESETS),
+                        help=f"comma separated camera presets from {', '.join(CAMERA_PRESETS)} (default: iso)")
+    parser.add_argument("--size", type=int, nargs=2, default=DEFAULT_IMAGE_SIZE, metavar=("WIDTH", "HEIGHT"),
+                        help="image size in pixels (default: 512 512)")
+    parser.add_argument("-j", "--writers", type=int, default=None, help="PNG writer threads (default: one per core)")
+    args = parser.parse_args(argv)
+    presets = args.presets.split(",")
+    for preset in presets:
+        if preset not in CAMERA_PRESETS:
+            parser.error(f"unknown camera preset {preset!r}")
+
+    try:
+        written = render_states(read_states(args.input), args.output, presets, tuple(args.size), args.writers)
+    except ValueError as error:
+        print(f"ERROR: {error}", file=sys.stderr)
+        return 1
+    print(f"{written} images written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
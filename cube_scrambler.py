@@ -0,0 +1,73 @@
+import argparse
+import sys
+
+import numpy as np
+
+from cube_core import COLOUR_LETTERS
+from cube_cubies import cubies_to_states, permutation_parity
+
+# States generated at a time when streaming to a file
+DEFAULT_CHUNK = 1 << 16
+
+
+def random_states(count: int, rng: np.random.Generator | None = None) -> np.ndarray:
+    # Uniformly random (count, 54) states from the cube group, in the solved orientation
+    rng = rng or np.random.default_rng()
+    cp = rng.permuted(np.tile(np.arange(8), (count, 1)), axis=1)
+    ep = rng.permuted(np.tile(np.arange(12), (count, 1)), axis=1)
+    # Corner and edge permutations must have the same parity, so swap two edges where they differ
+    odd = permutation_parity(cp) != permutation_parity(ep)
+    ep[odd, 10], ep[odd, 11] = ep[odd, 11], ep[odd, 10].copy()
+
+    # The last corner twist and edge flip are whatever make the totals a whole number of turns
+    co = rng.integers(0, 3, (count, 8))
+    co[:, 7] = -co[:, :7].sum(axis=1) % 3
+    eo = rng.integers(0, 2, (count, 12))
+    eo[:, 11] = eo[:, :11].sum(axis=1) % 2
+    return cubies_to_states(cp, co, ep, eo)
+
+
+def random_state(seed=None) -> np.ndarray:
+    return random_states(1, np.random.default_rng(seed))[0]
+
+
+def stream_states(count: int, seed=None, chunk: int = DEFAULT_CHUNK):
+    # Yield arrays of at most chunk states until count have been generated, reproducibly for a seed
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, chunk):
+        yield random_states(min(chunk, count - start), rng)
+
+
+def write_states(file, count: int, seed=None, text: bool = False, chunk: int = DEFAULT_CHUNK):
+    # Write states as 54 raw colour codes each, or as lines of 54 colour initials
+    letters = np.frombuffer(COLOUR_LETTERS.encode(), dtype=np.uint8)
+    for states in stream_states(count, seed, chunk):
+        if text:
+            lines = np.empty((len(states), states.shape[1] + 1), dtype=np.uint8)
+            lines[:, :-1] = letters[states]
+            lines[:, -1] = ord("\n")
+            file.write(lines.tobytes())
+        else:
+            file.write(np.ascontiguousarray(states, dtype=np.uint8).tobytes())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate uniformly random cube states.")
+    parser.add_argument("count", type=int, help="number of states")
+    parser.add_argument("-o", "--output", default="-", help="where to write the states (default: stdout)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for a reproducible set of states")
+    parser.add_argument("--binary", action="store_true",
+                        help="write 54 raw colour codes per state instead of a line of colour initials")
+    args = parser.parse_args(argv)
+
+    file = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        write_states(file, args.count, args.seed, text=not args.binary)
+    finally:
+        if file is not sys.stdout.buffer:
+            file.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+import argparse
+import asyncio
+import collections
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+
+from batch_solve import _load_tables, read_scramble
+from cube_core import MOVE_NAMES, SOLVED_STATE, apply_sequence_batch, format_state, move_codes, parse_state
+from cube_profiler import CallStats
+from cube_scrambler import random_states
+from cube_solver import solve
+from move_compiler import format_moves, parse_moves
+from solution_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, SolutionCache
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+# Apply requests arriving within this many seconds of the first are turned together in one vectorised call
+BATCH_WINDOW = 0.002
+MAX_BATCH = 4096
+
+# Limits that keep one request from tying up the service
+MAX_BODY_BYTES = 1 << 20
+MAX_SCRAMBLES = 10000
+
+
+class RequestError(Exception):
+    # A problem with the request itself, answered with 400 rather than 500
+    pass
+
+
+def _read_state(payload: dict, key: str = "state") -> np.ndarray:
+    # States travel as 54 colour initials, and a missing state means the solved cube
+    if payload.get(key) is None:
+        return SOLVED_STATE.copy()
+    return parse_state(payload[key])
+
+
+def _read_moves(payload: dict, key: str = "moves") -> list:
+    # Moves travel as one string of move names or a list of them, never as move codes
+    moves = payload.get(key, "")
+    if isinstance(moves, list) and all(isinstance(move, str) for move in moves):
+        moves = " ".join(moves)
+    if not isinstance(moves, str):
+        raise RequestError(f"{key} must be a string of moves or a list of move names")
+    return parse_moves(moves)
+
+
+def _solve_state(state: np.ndarray, max_length: int) -> list:
+    # Runs in a worker process
+    return solve(state, max_length)
+
+
+class ApplyBatcher:
+    # Collects apply requests for a short window and turns them all with one call per sequence length
+    def __init__(self, window: float = BATCH_WINDOW, max_batch: int = MAX_BATCH):
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = []
+        self.flush_handle = None
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, state: np.ndarray, moves: list) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        result = loop.create_future()
+        codes = move_codes(moves).reshape(-1)
+        # A bad code would fail the whole batch once it is flushed, so it is turned away here
+        if len(codes) and (codes.min() < 0 or codes.max() >= len(MOVE_NAMES)):
+            raise RequestError(f"Move codes must be between 0 and {len(MOVE_NAMES) - 1}")
+        self.pending.append((state, codes, result))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.window, self.flush)
+        return result
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        self.batches += 1
+        self.requests += len(pending)
+        try:
+            states = np.stack([state for state, _, _ in pending])
+            # Sequences of the same length stack into an (N, L) array of move codes
+            rows_by_length = collections.defaultdict(list)
+            for row, (_, codes, _) in enumerate(pending):
+                rows_by_length[len(codes)].append(row)
+            for length, rows in rows_by_length.items():
+                if length:
+                    codes = np.stack([pending[row][1] for row in rows])
+                    states[rows] = apply_sequence_batch(states[rows], codes)
+        except Exception as error:
+            # flush runs from a loop callback, so every waiting request must be told or it would hang
+            for _, _, result in pending:
+                if not result.done():
+                    result.set_exception(error)
+            return
+        for row, (_, _, result) in enumerate(pending):
+            if not result.done():
+                result.set_result(states[row])
+
+    def stats(self) -> dict:
+        return {"batches": self.batches,
+                "requests": self.requests,
+                "mean_batch_size": self.requests / self.batches if self.batches else 0.0}
+
+
+class CubeService:
+    # The engine behind an HTTP/JSON interface: apply moves, scramble and solve, with per-route latency stats
+    def __init__(self, workers: int | None = None, cache: SolutionCache | None = None,
+                 batch_window: float = BATCH_WINDOW):
+        self.workers = workers or os.cpu_count() or 1
+        # Spawned workers import only the numpy solver, and map its tables once each
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=_load_tables)
+        self.cache = cache if cache is not None else SolutionCache()
+        self.batcher = ApplyBatcher(batch_window)
+        self.routes = {("POST", "/apply"): self.apply,
+                       ("POST", "/scramble"): self.scramble,
+                       ("POST", "/solve"): self.solve,
+                       ("GET", "/stats"): self.stats}
+        self.latencies = collections.defaultdict(CallStats)
+        self.started = time.perf_counter()
+
+    async def apply(self, payload: dict) -> dict:
+        # The same moves cube_rotation makes, on any state
+        state = await self.batcher.submit(_read_state(payload), _read_moves(payload))
+        return {"state": format_state(state)}
+
+    async def scramble(self, payload: dict) -> dict:
+        # Uniformly random states, like the Randomise button; these take microseconds, so they are made here
+        count = int(payload.get("count", 1))
+        if not 1 <= count <= MAX_SCRAMBLES:
+            raise RequestError(f"count must be between 1 and {MAX_SCRAMBLES}")
+        states = random_states(count, np.random.default_rng(payload.get("seed")))
+        if "count" not in payload:
+            return {"state": format_state(states[0])}
+        return {"states": [format_state(state) for state in states]}
+
+    async def solve(self, payload: dict) -> dict:
+        # A state, or a scramble of moves from solved, answered from the solution cache or by a worker
+        if "scramble" in payload:
+            state = read_scramble(payload["scramble"])
+        else:
+            state = _read_state(payload)
+        max_length = int(payload.get("max_length", 24))
+        solution = self.cache.get(state)
+        cached = solution is not None
+        if not cached:
+            loop = asyncio.get_running_loop()
+            solution = await loop.run_in_executor(self.executor, _solve_state, state, max_length)
+            self.cache.put(state, solution)
+        return {"solution": format_moves(solution), "length": len(solution), "cached": cached}
+
+    async def stats(self, payload: dict) -> dict:
+        # Throughput over the service's lifetime and latency percentiles of recent requests, per route
+        uptime = time.perf_counter() - self.started
+        routes = dict()
+        for route, stats in self.latencies.items():
+            samples = np.fromiter(stats.samples, dtype=np.float64)
+            p50, p90, p99 = np.percentile(samples, [50, 90, 99]) * 1000
+            routes[route] = {"count": stats.count,
+                             "requests_per_second": stats.count / uptime,
+                             "mean_ms": stats.total / stats.count * 1000,
+                             "p50_ms": float(p50),
+                             "p90_ms": float(p90),
+                             "p99_ms": float(p99),
+                             "max_ms": float(samples.max()) * 1000}
+        return {"uptime": uptime, "workers": self.workers, "routes": routes,
+                "apply_batches": self.batcher.stats(), "solution_cache": self.cache.stats()}
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> tuple:
+        # Run a route and return the status and JSON reply, timing everything but the network
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"{method} is not supported on {path}"}
+            return HTTPStatus.NOT_FOUND, {"error": f"No such endpoint {path}"}
+        start = time.perf_counter()
+        try:
+            payload = json.loads(body) if body else dict()
+            if not isinstance(payload, dict):
+                raise RequestError("The request body must be a JSON object")
+            reply = await handler(payload)
+            status = HTTPStatus.OK
+        except (RequestError, ValueError, KeyError, TypeError) as error:
+            status, reply = HTTPStatus.BAD_REQUEST, {"error": str(error)}
+        except Exception as error:
+            status, reply = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(error).__name__}: {error}"}
+        if path != "/stats":
+            self.latencies[path].add(time.perf_counter() - start)
+        return status, reply
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # HTTP/1.1 with keep-alive, which is all a JSON client on localhost needs
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = dict()
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    length = int(headers.get("content-length", 0))
+                    if length < 0:
+                        raise ValueError("Negative Content-Length")
+                except ValueError:
+                    _write_response(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request"}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    _write_response(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                    {"error": f"Bodies are limited to {MAX_BODY_BYTES} bytes"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, reply = await self.dispatch(method, target.split("?")[0], body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                _write_response(writer, status, reply, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self.batcher.flush()
+        self.executor.shutdown(cancel_futures=True)
+        self.cache.close()
+
+
+def _write_response(writer: asyncio.StreamWriter, status: HTTPStatus, reply: dict, keep_alive: bool):
+    body = json.dumps(reply).encode()
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+
+
+async def start_service(service: CubeService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.Server:
+    # Port 0 picks a free port, which the returned server reports in its sockets
+    return await asyncio.start_server(service.handle_connection, host, port)
+
+
+class ServiceClient:
+    # A keep-alive JSON client for tests and load generation against a local service
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, payload: dict | None = None) -> tuple:
+        # Returns the status code and the decoded JSON reply
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        headers = dict()
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        reply = json.loads(await self.reader.readexactly(int(headers["content-length"])))
+        if headers.get("connection") == "close":
+            await self.close()
+        return status, reply
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+            self.reader = self.writer = None
+
+
+async def load_test(host: str, port: int, path: str, payload: dict, requests: int = 10000,
+                    connections: int = 64) -> dict:
+    # Send requests over many concurrent connections and report throughput and client-side latency percentiles
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        client = ServiceClient(host, port)
+        try:
+            for _ in remaining:
+                start = time.perf_counter()
+                status, reply = await client.request("POST", path, payload)
+                if status != HTTPStatus.OK:
+                    raise RuntimeError(f"{path} answered {status}: {reply.get('error')}")
+                latencies.append(time.perf_counter() - start)
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+    return {"requests": len(latencies),
+            "requests_per_second": len(latencies) / elapsed,
+            "p50_ms": float(p50),
+            "p90_ms": float(p90),
+            "p99_ms": float(p99)}
+
+
+async def serve(host: str, port: int, workers: int | None = None, cache: SolutionCache | None = None,
+                batch_window: float = BATCH_WINDOW):
+    service = CubeService(workers, cache, batch_window)
+    server = await start_service(service, host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Serving on http://{address[0]}:{address[1]}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve cube moves, scrambles and solutions over HTTP/JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="solver processes (default: one per core)")
+    parser.add_argument("--cache", metavar="PATH", default=DEFAULT_CACHE_PATH,
+                        help="keep solutions of symmetric positions in this file")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES, help="solutions kept in memory")
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW * 1000,
+                        help="milliseconds to collect apply requests into one batch "
+                             f"(default: {BATCH_WINDOW * 1000:g})")
+    args = parser.parse_args(argv)
+
+    cache = SolutionCache(args.cache_size, args.cache)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, cache, args.batch_window / 1000))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+import itertools
+import math
+import time
+
+import numpy as np
+
+from cube_core import as_state
+from cube_profiler import profiled
+from cube_tables import DEFAULT_TABLES_PATH, load_tables, write_tables
+from cube_cubies import MOVE_CUBIES, apply_cubie_move, permutation_rank, permutation_unrank, state_to_cubies
+from cube_validation import check_state
+
+# Define the face turns the solver searches over, three per face with opposite faces three apart
+SOLVER_FACES = ("U", "R", "F", "D", "L", "B")
+SOLVER_MOVES = tuple(face + turn for face in SOLVER_FACES for turn in ("", "2", "'"))
+
+# Moves that keep the cube inside the phase two subgroup <U, D, R2, L2, F2, B2>
+PHASE_TWO_MOVES = ("U", "U2", "U'", "D", "D2", "D'", "R2", "F2", "L2", "B2")
+
+# Sizes of the coordinates used by each phase
+TWISTS = 3 ** 7
+FLIPS = 2 ** 11
+SLICES = 495
+CORNER_PERMUTATIONS = 40320
+UD_EDGE_PERMUTATIONS = 40320
+SLICE_PERMUTATIONS = 24
+
+# Longest solution either phase can need, which bounds the search
+PHASE_ONE_DEPTH = 12
+PHASE_TWO_DEPTH = 18
+
+# After the first solution, keep looking for shorter ones through deeper phase one depths for this long
+# Short scrambles run out of depths to try long before this, so they always get the full search
+IMPROVE_SECONDS = 0.25
+
+# Binomial coefficients used to rank the middle layer edge positions
+COMBINATIONS = np.array([[math.comb(n, k) for k in range(13)] for n in range(13)], dtype=np.int64)
+
+# The tables are loaded, or built and saved, the first time a cube is solved
+solver_tables = None
+
+
+def twist_coordinate(co: np.ndarray) -> np.ndarray:
+    # Corner orientations as a base 3 number, ignoring the last corner which the others fix
+    co = np.atleast_2d(co)
+    return (co[:, :7] * 3 ** np.arange(6, -1, -1)).sum(axis=1)
+
+
+def flip_coordinate(eo: np.ndarray) -> np.ndarray:
+    # Edge orientations as a base 2 number, ignoring the last edge which the others fix
+    eo = np.atleast_2d(eo)
+    return (eo[:, :11] * 2 ** np.arange(10, -1, -1)).sum(axis=1)
+
+
+def slice_coordinate(ep: np.ndarray) -> np.ndarray:
+    # Rank of the positions holding the four middle layer edges, 0 when they are all in the middle layer
+    occupied = np.atleast_2d(ep)[:, ::-1] >= 8
+    ranks = np.zeros(len(occupied), dtype=np.int64)
+    seen = np.zeros(len(occupied), dtype=np.int64)
+    for position in range(12):
+        seen += occupied[:, position]
+        ranks += np.where(occupied[:, position], COMBINATIONS[position, seen], 0)
+    return ranks
+
+
+def _twist_orientations() -> np.ndarray:
+    # Corner orientations for every twist coordinate
+    co = np.zeros((TWISTS, 8), dtype=np.intp)
+    remaining = np.arange(TWISTS)
+    for position in range(6, -1, -1):
+        remaining, co[:, position] = np.divmod(remaining, 3)
+    co[:, 7] = -co[:, :7].sum(axis=1) % 3
+    return co
+
+
+def _flip_orientations() -> np.ndarray:
+    # Edge orientations for every flip coordinate
+    eo = np.zeros((FLIPS, 12), dtype=np.intp)
+    remaining = np.arange(FLIPS)
+    for position in range(10, -1, -1):
+        remaining, eo[:, position] = np.divmod(remaining, 2)
+    eo[:, 11] = eo[:, :11].sum(axis=1) % 2
+    return eo
+
+
+def _slice_edges() -> np.ndarray:
+    # An edge permutation for every slice coordinate, using 8 to mark the middle layer edges
+    ep = np.zeros((SLICES, 12), dtype=np.intp)
+    for positions in itertools.combinations(range(12), 4):
+        ep[0, :] = 0
+        ep[0, list(positions)] = 8
+        ep[slice_coordinate(ep[0])[0]] = ep[0]
+    return ep
+
+
+def build_move_tables() -> dict:
+    # How every coordinate changes under every move, as (coordinate, move) tables
+    twists = _twist_orientations()
+    flips = _flip_orientations()
+    slices = _slice_edges()
+    corners = permutation_unrank(np.arange(CORNER_PERMUTATIONS), 8)
+    ud_edges = np.hstack([permutation_unrank(np.arange(UD_EDGE_PERMUTATIONS), 8),
+                          np.tile(np.arange(8, 12), (UD_EDGE_PERMUTATIONS, 1))])
+    slice_edges = np.hstack([np.tile(np.arange(8), (SLICE_PERMUTATIONS, 1)),
+                             8 + permutation_unrank(np.arange(SLICE_PERMUTATIONS), 4)])
+
+    tables = {"twist": [], "flip": [], "slice": [], "corners": [], "ud_edges": [], "slice_edges": []}
+    for move in SOLVER_MOVES:
+        cp, co, ep, eo = MOVE_CUBIES[move]
+        tables["twist"].append(twist_coordinate((twists[:, cp] + co) % 3))
+        tables["flip"].append(flip_coordinate((flips[:, ep] + eo) % 2))
+        tables["slice"].append(slice_coordinate(slices[:, ep]))
+        tables["corners"].append(permutation_rank(corners[:, cp]))
+    for move in PHASE_TWO_MOVES:
+        cp, co, ep, eo = MOVE_CUBIES[move]
+        tables["ud_edges"].append(permutation_rank(ud_edges[:, ep][:, :8]))
+        tables["slice_edges"].append(permutation_rank(slice_edges[:, ep][:, 8:] - 8))
+    return {name: np.stack(columns, axis=1).astype(np.uint16) for name, columns in tables.items()}
+
+
+def build_pruning_table(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    # Breadth-first search out from the solved coordinates, recording how many moves each pair needs
+    size = len(second)
+    depths = np.full(len(first) * size, -1, dtype=np.int8)
+    depths[0] = 0
+    frontier = np.zeros(1, dtype=np.int64)
+    depth = 0
+    while frontier.size:
+        depth += 1
+        neighbours = (first[frontier // size].astype(np.int64) * size + second[frontier % size]).ravel()
+        depths[neighbours[depths[neighbours] < 0]] = depth
+        frontier = np.flatnonzero(depths == depth)
+    return depths
+
+
+def build_tables() -> dict:
+    tables = build_move_tables()
+    tables["phase_two_corners"] = tables["corners"][:, [SOLVER_MOVES.index(move) for move in PHASE_TWO_MOVES]]
+    tables["twist_slice"] = build_pruning_table(tables["twist"], tables["slice"])
+    tables["flip_slice"] = build_pruning_table(tables["flip"], tables["slice"])
+    tables["corners_slice_edges"] = build_pruning_table(tables["phase_two_corners"], tables["slice_edges"])
+    tables["ud_edges_slice_edges"] = build_pruning_table(tables["ud_edges"], tables["slice_edges"])
+    return tables
+
+
+def get_tables() -> dict:
+    # Map the saved tables, rebuilding them if they are missing, stale or corrupt
+    global solver_tables
+    if solver_tables is None:
+        try:
+            solver_tables = load_tables(DEFAULT_TABLES_PATH)
+        except (OSError, ValueError):
+            solver_tables = build_tables()
+            # Saving is only a speed-up for later processes, so a read-only location is not an error
+            try:
+                write_tables(DEFAULT_TABLES_PATH, solver_tables)
+            except OSError:
+                pass
+    return solver_tables
+
+
+@profiled("solve")
+def solve(cube, max_length: int = 24, improve_seconds: float = IMPROVE_SECONDS) -> list:
+    # Two-phase search for a short sequence of face turns that solves the cube
+    state = as_state(cube)
+    check_state(state)
+    cubies = state_to_cubies(state)
+    search = _TwoPhaseSearch(get_tables(), cubies)
+    while True:
+        solution = search.run(max_length, improve_seconds)
+        if solution is not None:
+            return solution
+        max_length += 1
+
+
+class _TwoPhaseSearch:
+    def __init__(self, tables: dict, cubies: tuple):
+        # Flat memoryviews index to plain ints, which keeps the recursion fast
+        self.twist = memoryview(tables["twist"].ravel())
+        self.flip = memoryview(tables["flip"].ravel())
+        self.slice = memoryview(tables["slice"].ravel())
+        self.corners = memoryview(tables["corners"].ravel())
+        self.phase_two_corners = memoryview(tables["phase_two_corners"].ravel())
+        self.ud_edges = memoryview(tables["ud_edges"].ravel())
+        self.slice_edges = memoryview(tables["slice_edges"].ravel())
+        self.twist_slice = memoryview(tables["twist_slice"].view(np.uint8))
+        self.flip_slice = memoryview(tables["flip_slice"].view(np.uint8))
+        self.corners_slice_edges = memoryview(tables["corners_slice_edges"].view(np.uint8))
+        self.ud_edges_slice_edges = memoryview(tables["ud_edges_slice_edges"].view(np.uint8))
+
+        # Never turn the same face twice in a row, and only turn opposite faces in one order
+        phase_two_indices = [SOLVER_MOVES.index(move) for move in PHASE_TWO_MOVES]
+        self.phase_one_moves = []
+        self.phase_two_moves = []
+        for last in list(range(len(SOLVER_MOVES))) + [None]:
+            allowed = [move for move in range(len(SOLVER_MOVES))
+                       if last is None or move // 3 not in (last // 3, last // 3 - 3)]
+            self.phase_one_moves.append(allowed)
+            self.phase_two_moves.append([(index, move) for index, move in enumerate(phase_two_indices)
+                                         if move in allowed])
+        self.phase_two_indices = set(phase_two_indices)
+
+        self.cubies = cubies
+        cp, co, ep, eo = cubies
+        self.start = (int(twist_coordinate(co)[0]), int(flip_coordinate(eo)[0]),
+                      int(slice_coordinate(ep)[0]), int(permutation_rank(cp)[0]))
+        self.path = []
+        self.best = None
+        self.deadline = None
+
+    def run(self, max_length: int, improve_seconds: float = IMPROVE_SECONDS) -> list | None:
+        # The shortest solution found within max_length, going on through deeper phase one depths with the bound
+        # lowered below every solution found, until the depths run out or improve_seconds pass after the first one
+        twist, flip, slice_, corners = self.start
+        self.max_length = max_length
+        self.improve_seconds = improve_seconds
+        self.path = []
+        self.best = None
+        self.deadline = None
+        depth = max(self.twist_slice[twist * SLICES + slice_], self.flip_slice[flip * SLICES + slice_])
+        while depth <= min(self.max_length, PHASE_ONE_DEPTH):
+            if self._phase_one(twist, flip, slice_, corners, depth, -1):
+                break
+            depth += 1
+        return self.best
+
+    def _phase_one(self, twist: int, flip: int, slice_: int, corners: int, depth: int, last: int) -> bool:
+        # The bound drops every time a solution is found, which can leave nothing to find down this branch
+        if len(self.path) + depth > self.max_length:
+            return False
+        if depth == 0:
+            # A phase two move at the end means a shorter phase one solution was already tried
+            if twist or flip or slice_ or last in self.phase_two_indices:
+                return False
+            return self._start_phase_two(corners, last)
+        moves = len(SOLVER_MOVES)
+        for move in self.phase_one_moves[last]:
+            new_twist = self.twist[twist * moves + move]
+            new_flip = self.flip[flip * moves + move]
+            new_slice = self.slice[slice_ * moves + move]
+            if (self.twist_slice[new_twist * SLICES + new_slice] >= depth
+                    or self.flip_slice[new_flip * SLICES + new_slice] >= depth):
+                continue
+            self.path.append(move)
+            if self._phase_one(new_twist, new_flip, new_slice, self.corners[corners * moves + move], depth - 1,
+                               move):
+                return True
+            self.path.pop()
+        return False
+
+    def _start_phase_two(self, corners: int, last: int) -> bool:
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return True
+        cubies = self.cubies
+        for move in self.path:
+            cubies = apply_cubie_move(cubies, SOLVER_MOVES[move])
+        ep = cubies[2]
+        ud_edges = int(permutation_rank(ep[:8])[0])
+        slice_edges = int(permutation_rank(ep[8:] - 8)[0])
+        estimate = max(self.corners_slice_edges[corners * SLICE_PERMUTATIONS + slice_edges],
+                       self.ud_edges_slice_edges[ud_edges * SLICE_PERMUTATIONS + slice_edges])
+        for depth in range(estimate, min(self.max_length - len(self.path), PHASE_TWO_DEPTH) + 1):
+            if self._phase_two(corners, ud_edges, slice_edges, depth, last):
+                self.best = [SOLVER_MOVES[move] for move in self.path]
+                del self.path[len(self.path) - depth:]
+                self.max_length = len(self.best) - 1
+                if self.deadline is None:
+                    self.deadline = time.perf_counter() + self.improve_seconds
+                # True stops the whole search, False goes on looking for something shorter
+                return time.perf_counter() >= self.deadline
+        return False
+
+    def _phase_two(self, corners: int, ud_edges: int, slice_edges: int, depth: int, last: int) -> bool:
+        if depth == 0:
+            return corners == 0 and ud_edges == 0 and slice_edges == 0
+        moves = len(PHASE_TWO_MOVES)
+        for index, move in self.phase_two_moves[last]:
+            new_corners = self.phase_two_corners[corners * moves + index]
+            new_slice_edges = self.slice_edges[slice_edges * moves + index]
+            if self.corners_slice_edges[new_corners * SLICE_PERMUTATIONS + new_slice_edges] >= depth:
+                continue
+            new_ud_edges = self.ud_edges[ud_edges * moves + index]
+            if self.ud_edges_slice_edges[new_ud_edges * SLICE_PERMUTATIONS + new_slice_edges] >= depth:
+                continue
+            self.path.append(move)
+            if self._phase_two(new_corners, new_ud_edges, new_slice_edges, depth - 1, move):
+                return True
+            self.path.pop()
+        return False
@@ -0,0 +1,108 @@
+import numpy as np
+
+from cube_core import MOVE_NAMES, MOVE_TABLES, SOLVED_STATE, as_state
+from cube_cubies import CENTRE_STICKERS
+from nxn_cube import sticker_geometry
+
+SOLVED_CENTRES = SOLVED_STATE[CENTRE_STICKERS]
+IDENTITY = np.arange(len(SOLVED_STATE))
+
+
+def _rotation_tables() -> list:
+    # The 24 ways of holding the cube, as every product of RCX and RCY, with the identity first
+    tables = [IDENTITY]
+    for table in tables:
+        for move in ("RCX", "RCY"):
+            turned = table[MOVE_TABLES[move]]
+            if not any((turned == known).all() for known in tables):
+                tables.append(turned)
+    return tables
+
+
+def _mirror_table() -> np.ndarray:
+    # Reflection of every sticker through the plane between L and R
+    centres, _, _ = sticker_geometry(3)
+    positions = {tuple(centre): index for index, centre in enumerate(centres)}
+    return np.array([positions[(-x, y, z)] for x, y, z in centres], dtype=np.intp)
+
+
+# Symmetries 0-23 are the rotations, and 24-47 are the same rotations after a mirror
+ROTATIONS = 24
+SYMMETRIES = 48
+ROTATION_TABLES = np.array(_rotation_tables(), dtype=np.intp)
+MIRROR_TABLE = _mirror_table()
+SYMMETRY_TABLES = np.concatenate([ROTATION_TABLES, MIRROR_TABLE[ROTATION_TABLES]])
+
+
+def _inverse_symmetries() -> np.ndarray:
+    inverses = np.argsort(SYMMETRY_TABLES, axis=1)
+    return np.array([np.flatnonzero((SYMMETRY_TABLES == inverse).all(axis=1))[0] for inverse in inverses])
+
+
+SYMMETRY_INVERSES = _inverse_symmetries()
+
+
+def _move_maps() -> list:
+    # The move each move becomes under every symmetry, for moves whose image is also a move
+    codes = {MOVE_TABLES[move].tobytes(): move for move in MOVE_NAMES}
+    maps = []
+    for table, inverse in zip(SYMMETRY_TABLES, np.argsort(SYMMETRY_TABLES, axis=1)):
+        images = (inverse[MOVE_TABLES[move][table]].tobytes() for move in MOVE_NAMES)
+        maps.append({move: codes[image] for move, image in zip(MOVE_NAMES, images) if image in codes})
+    return maps
+
+
+MOVE_MAPS = _move_maps()
+
+
+def conjugate_states(states: np.ndarray, symmetries=None) -> np.ndarray:
+    # Every state under every symmetry, recoloured so its centres are back in their solved colours
+    # Returns an (N, S, 54) array for S symmetries, which default to all 48
+    states = np.atleast_2d(states)
+    tables = SYMMETRY_TABLES if symmetries is None else SYMMETRY_TABLES[symmetries]
+    moved = states[:, tables]
+    colour_map = np.empty(moved.shape[:2] + (len(SOLVED_CENTRES),), dtype=states.dtype)
+    np.put_along_axis(colour_map, moved[..., CENTRE_STICKERS].astype(np.intp),
+                      np.broadcast_to(SOLVED_CENTRES, colour_map.shape), axis=2)
+    return np.take_along_axis(colour_map, moved.astype(np.intp), axis=2)
+
+
+def _lexicographic_min(candidates: np.ndarray) -> np.ndarray:
+    # Index of the smallest row of each (S, 54) block, comparing eight bytes at a time
+    rows, count, size = candidates.shape
+    padded = np.zeros((rows, count, -(-size // 8) * 8), dtype=np.uint8)
+    padded[..., :size] = candidates
+    words = padded.view(">u8")
+    best = np.ones((rows, count), dtype=bool)
+    for column in range(words.shape[2]):
+        column_words = np.where(best, words[..., column], np.iinfo(np.uint64).max)
+        best &= column_words == column_words.min(axis=1, keepdims=True)
+    return best.argmax(axis=1)
+
+
+def canonical_states(states: np.ndarray, mirrors: bool = False) -> tuple:
+    # The representative of each state's symmetry class, and the symmetry that maps the state onto it
+    # The representative is the lexicographically smallest conjugate, so every member of a class finds the same one
+    states = np.atleast_2d(as_state(states))
+    symmetries = np.arange(SYMMETRIES if mirrors else ROTATIONS)
+    conjugates = conjugate_states(states, symmetries)
+    best = _lexicographic_min(conjugates)
+    return conjugates[np.arange(len(states)), best], symmetries[best]
+
+
+def canonical_state(cube, mirrors: bool = False) -> tuple:
+    canonical, symmetry = canonical_states(as_state(cube), mirrors)
+    return canonical[0], int(symmetry[0])
+
+
+def unique_classes(states: np.ndarray, mirrors: bool = False) -> np.ndarray:
+    # Index of the first state of every symmetry class, in input order, for deduplicating datasets
+    canonical, _ = canonical_states(states, mirrors)
+    _, first = np.unique(canonical, axis=0, return_index=True)
+    return np.sort(first)
+
+
+def remap_moves(moves, symmetry: int) -> list:
+    # Rewrite moves made on a conjugated cube as the moves that do the same on the original
+    move_map = MOVE_MAPS[SYMMETRY_INVERSES[symmetry]]
+    return [move_map[move] for move in moves]
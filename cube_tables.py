@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+from cube_core import MOVE_NAMES, MOVE_TABLE_ARRAY
+
+# Layout of a tables file:
+#   8 byte magic, uint32 format version, uint32 directory length
+#   JSON directory listing every table's dtype, shape and offset, plus checksums
+#   table data, each table starting on a 64 byte boundary
+TABLES_MAGIC = b"RCTABLES"
+TABLES_VERSION = 1
+TABLES_HEADER = struct.Struct("<8sII")
+TABLES_ALIGNMENT = 64
+
+# Where the solver looks for its tables unless told otherwise
+DEFAULT_TABLES_PATH = os.environ.get("RUBIK_CUBE_TABLES",
+                                     os.path.join(os.path.dirname(os.path.abspath(__file__)), "cube_tables.bin"))
+
+
+def moves_fingerprint() -> str:
+    # Hash of the move definitions the tables were built from, so stale tables are never used
+    digest = hashlib.sha256()
+    digest.update(json.dumps(MOVE_NAMES).encode())
+    digest.update(MOVE_TABLE_ARRAY.astype(np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // TABLES_ALIGNMENT) * TABLES_ALIGNMENT
+
+
+def write_tables(path: str, tables: dict):
+    # Write the tables to a versioned binary file, replacing any existing file in one step
+    entries = dict()
+    offset = 0
+    for name, table in tables.items():
+        table = np.ascontiguousarray(table)
+        entries[name] = {"dtype": table.dtype.str, "shape": list(table.shape), "offset": offset}
+        offset = _aligned(offset + table.nbytes)
+
+    checksum = hashlib.sha256()
+    for name, table in tables.items():
+        checksum.update(np.ascontiguousarray(table).tobytes())
+    directory = json.dumps({"tables": entries,
+                            "moves": moves_fingerprint(),
+                            "checksum": checksum.hexdigest()}).encode()
+    data_start = _aligned(TABLES_HEADER.size + len(directory))
+
+    folder = os.path.dirname(os.path.abspath(path))
+    handle, temporary_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            file.write(TABLES_HEADER.pack(TABLES_MAGIC, TABLES_VERSION, len(directory)))
+            file.write(directory)
+            for name, table in tables.items():
+                file.seek(data_start + entries[name]["offset"])
+                file.write(np.ascontiguousarray(table).tobytes())
+            file.truncate(data_start + offset)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+def load_tables(path: str, verify: bool = True) -> dict:
+    # Memory-map every table read-only, so processes on one host share the same pages
+    with open(path, "rb") as file:
+        magic, version, directory_length = TABLES_HEADER.unpack(file.read(TABLES_HEADER.size))
+        if magic != TABLES_MAGIC:
+            raise ValueError(f"{path} is not a cube tables file")
+        if version != TABLES_VERSION:
+            raise ValueError(f"{path} has table format version {version}, expected {TABLES_VERSION}")
+        directory = json.loads(file.read(directory_length))
+    if directory["moves"] != moves_fingerprint():
+        raise ValueError(f"{path} was built from different move definitions")
+
+    data_start = _aligned(TABLES_HEADER.size + directory_length)
+    tables = dict()
+    for name, entry in directory["tables"].items():
+        tables[name] = np.memmap(path, dtype=np.dtype(entry["dtype"]), mode="r",
+                                 offset=data_start + entry["offset"], shape=tuple(entry["shape"]))
+
+    if verify:
+        checksum = hashlib.sha256()
+        for table in tables.values():
+            checksum.update(memoryview(table).cast("B"))
+        if checksum.hexdigest() != directory["checksum"]:
+            raise ValueError(f"{path} failed its checksum")
+    return tables
+
+
+def generate_tables(path: str = DEFAULT_TABLES_PATH) -> dict:
+    # Build the solver tables from scratch and save them for later processes
+    from cube_solver import build_tables
+    tables = build_tables()
+    write_tables(path, tables)
+    return tables
+
+
+if __name__ == "__main__":
+    generate_tables(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TABLES_PATH)
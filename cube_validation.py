@@ -0,0 +1,154 @@
+import argparse
+import sys
+
+import numpy as np
+
+from cube_core import COLOUR_LETTERS, COLOUR_NAMES, SOLVED_STATE, as_state
+from cube_cubies import (CENTRE_ORIENTATIONS, CENTRE_STICKERS, ORIENTATION_LOOKUP, permutation_parity,
+                         states_to_cubies)
+from cube_format import STATES_MAGIC, StateFile
+
+# Every problem a state can have, as bit flags so a row can report several at once
+# Pieces are only read once the colours and centres are right, and twist, flip and parity once every piece exists
+BAD_COLOURS = 1
+COLOUR_COUNTS = 2
+CENTRES = 4
+PIECES = 8
+CORNER_TWIST = 16
+EDGE_FLIP = 32
+PARITY = 64
+PROBLEMS = {BAD_COLOURS: "Cube has stickers that are not one of the six colours",
+            COLOUR_COUNTS: "Cube does not have nine stickers of every colour",
+            CENTRES: "Cube centres are not arranged as on a real cube",
+            PIECES: "Cube has missing or repeated pieces",
+            CORNER_TWIST: "Cube has a twisted corner",
+            EDGE_FLIP: "Cube has a flipped edge",
+            PARITY: "Cube has two pieces swapped"}
+
+# Rows validated at a time, small enough for each chunk's arrays to stay in cache, which also bounds memory
+CHUNK_ROWS = 1 << 12
+
+STICKERS_PER_COLOUR = len(SOLVED_STATE) // len(COLOUR_NAMES)
+
+# Colour code of every byte value of a colour initial, and an out of range code for anything else
+LETTER_CODES = np.full(256, len(COLOUR_NAMES), dtype=np.uint8)
+for code, letter in enumerate(COLOUR_LETTERS):
+    LETTER_CODES[ord(letter)] = LETTER_CODES[ord(letter.lower())] = code
+
+
+def _validate_chunk(states: np.ndarray) -> np.ndarray:
+    rows = len(states)
+    problems = np.zeros(rows, dtype=np.uint8)
+    bad_colours = (states >= len(COLOUR_NAMES)).any(axis=1)
+    problems[bad_colours] |= BAD_COLOURS
+    states = np.where(bad_colours[:, None], 0, states).astype(np.intp)
+
+    # Count every colour of every row at once by giving each row its own range of bins
+    counts = np.bincount((states + np.arange(rows)[:, None] * len(COLOUR_NAMES)).ravel(),
+                         minlength=rows * len(COLOUR_NAMES)).reshape(rows, -1)
+    problems[(counts != STICKERS_PER_COLOUR).any(axis=1) & ~bad_colours] |= COLOUR_COUNTS
+
+    # The first two centres pick the only way the cube could be held, and the other four must agree with it
+    centres = states[:, CENTRE_STICKERS]
+    orientation = ORIENTATION_LOOKUP[centres[:, 0], centres[:, 1]]
+    held = (orientation >= 0) & (CENTRE_ORIENTATIONS[orientation] == centres).all(axis=1)
+    problems[~held & ~bad_colours] |= CENTRES
+
+    checked = np.flatnonzero(problems == 0)
+    cp, co, ep, eo = states_to_cubies(states[checked])
+    pieces = (np.sort(cp, axis=1) == np.arange(cp.shape[1])).all(axis=1) & \
+             (np.sort(ep, axis=1) == np.arange(ep.shape[1])).all(axis=1)
+    problems[checked[~pieces]] |= PIECES
+    problems[checked[pieces & (co.sum(axis=1) % 3 != 0)]] |= CORNER_TWIST
+    problems[checked[pieces & (eo.sum(axis=1) % 2 != 0)]] |= EDGE_FLIP
+    problems[checked[pieces & (permutation_parity(cp) != permutation_parity(ep))]] |= PARITY
+    return problems
+
+
+def validate_states(states: np.ndarray) -> np.ndarray:
+    # Problem flags of every row of an (N, 54) array, 0 for states a real cube can reach
+    states = np.atleast_2d(states)
+    if states.shape[1] != len(SOLVED_STATE):
+        raise ValueError(f"Expected states of {len(SOLVED_STATE)} stickers, got {states.shape[1]}")
+    return np.concatenate([_validate_chunk(states[start:start + CHUNK_ROWS])
+                           for start in range(0, len(states), CHUNK_ROWS)] or [np.zeros(0, dtype=np.uint8)])
+
+
+def describe(problems: int) -> list:
+    return [message for flag, message in PROBLEMS.items() if problems & flag]
+
+
+def check_state(cube):
+    # Raise a ValueError naming everything wrong with a state that no real cube can reach
+    problems = int(validate_states(as_state(cube))[0])
+    if problems:
+        raise ValueError("; ".join(describe(problems)))
+
+
+def is_valid(cube) -> bool:
+    return not validate_states(as_state(cube))[0]
+
+
+def parse_states(lines) -> np.ndarray:
+    # Read lines of 54 colour initials into an (N, 54) array, flagging lines of the wrong length as bad colours
+    lines = [line.strip().encode() for line in lines]
+    states = np.full((len(lines), len(SOLVED_STATE)), len(COLOUR_NAMES), dtype=np.uint8)
+    complete = np.array([len(line) == len(SOLVED_STATE) for line in lines], dtype=bool)
+    if complete.any():
+        letters = np.frombuffer(b"".join(line for line in lines if len(line) == len(SOLVED_STATE)), dtype=np.uint8)
+        states[complete] = LETTER_CODES[letters].reshape(-1, len(SOLVED_STATE))
+    return states
+
+
+def read_state_chunks(path: str):
+    # Yield (labels, states) a chunk at a time from a packed states file, or from lines of 54 colour initials
+    # labelled by line number, skipping blank lines and comments
+    if path != "-":
+        with open(path, "rb") as file:
+            packed = file.read(len(STATES_MAGIC)) == STATES_MAGIC
+        if packed:
+            states = StateFile(path)
+            for start in range(0, len(states), CHUNK_ROWS):
+                chunk = states[start:start + CHUNK_ROWS]
+                yield [f"state {number}" for number in range(start, start + len(chunk))], chunk
+            return
+    source = sys.stdin if path == "-" else open(path)
+    try:
+        labels, lines = [], []
+        for number, text in enumerate(source, 1):
+            if not text.strip() or text.lstrip().startswith("#"):
+                continue
+            labels.append(f"line {number}")
+            lines.append(text)
+            if len(lines) == CHUNK_ROWS:
+                yield labels, parse_states(lines)
+                labels, lines = [], []
+        if lines:
+            yield labels, parse_states(lines)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check that cube states could come from a real cube.")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="packed states file, or one state per line as 54 colour initials (default: stdin)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args(argv)
+
+    total = 0
+    failures = 0
+    for labels, states in read_state_chunks(args.input):
+        problems = validate_states(states)
+        for row in np.flatnonzero(problems):
+            failures += 1
+            if not args.quiet:
+                print(f"{labels[row]}: {'; '.join(describe(problems[row]))}")
+        total += len(states)
+    print(f"{total - failures} of {total} states are valid", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import itertools
+import re
+
+import numpy as np
+
+from cube_core import MOVE_TABLES, SOLVED_STATE, as_state, compose_moves
+
+# Define the moves that turn about each axis, in the order they are written out
+# Moves on the same axis commute, so any run of them can be merged and rewritten
+AXIS_MOVES = {"LR": ("L", "R", "M"),
+              "FB": ("F", "B", "S", "RCY"),
+              "UD": ("U", "D", "E", "RCX")}
+MOVE_AXES = {move: axis for axis, moves in AXIS_MOVES.items() for move in moves}
+
+# A move is a face, slice or whole-cube rotation followed by nothing, ' or 2
+MOVE_PATTERN = re.compile(r"\s*(RCX|RCY|[UDFBLRMES])(['2]?)")
+TURN_SUFFIXES = ("", "2", "'")
+
+IDENTITY = np.arange(len(SOLVED_STATE))
+
+
+def parse_moves(text: str) -> list:
+    # Split a sequence such as "R U R' U'" or "RUR'U'" into moves, rejecting anything else
+    moves = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = MOVE_PATTERN.match(text, position)
+        if match is None:
+            raise ValueError(f"Unrecognised move at position {position} of {text!r}")
+        moves.append(match.group(1) + match.group(2))
+        position = match.end()
+    return moves
+
+
+def format_moves(moves) -> str:
+    return " ".join(moves)
+
+
+def _canonical_words() -> dict:
+    # Find the shortest way to write every combination of turns about each axis
+    # Ties go to fewer whole-cube rotations, then fewer slice moves, then the earlier word
+    words = {axis: dict() for axis in AXIS_MOVES}
+    for axis, moves in AXIS_MOVES.items():
+        for powers in itertools.product(range(4), repeat=len(moves)):
+            word = [move + TURN_SUFFIXES[power - 1] for move, power in zip(moves, powers) if power]
+            key = compose_moves(word).tobytes()
+            score = (len(word),
+                     sum(move.startswith("RC") for move in word),
+                     sum(move[0] in "MES" for move in word))
+            if key not in words[axis] or score < words[axis][key][0]:
+                words[axis][key] = (score, word)
+    return {axis: {key: word for key, (score, word) in axis_words.items()} for axis, axis_words in words.items()}
+
+
+CANONICAL_WORDS = _canonical_words()
+
+
+def simplify_moves(moves) -> list:
+    # Cancel and merge runs of moves about the same axis, including opposite faces that commute
+    if isinstance(moves, str):
+        moves = parse_moves(moves)
+    runs = []
+    for move in moves:
+        axis = MOVE_AXES[move.rstrip("'2")]
+        if runs and runs[-1][0] == axis:
+            runs[-1][1] = runs[-1][1][MOVE_TABLES[move]]
+            # A run that cancels out lets its neighbours merge with each other
+            if (runs[-1][1] == IDENTITY).all():
+                runs.pop()
+        else:
+            runs.append([axis, MOVE_TABLES[move]])
+    return [move for axis, table in runs for move in CANONICAL_WORDS[axis][table.tobytes()]]
+
+
+def compile_moves(moves) -> np.ndarray:
+    # Precompose a whole sequence into one permutation that applies it with a single gather
+    if isinstance(moves, str):
+        moves = parse_moves(moves)
+    return compose_moves(moves)
+
+
+def apply_compiled(cube, table: np.ndarray) -> np.ndarray:
+    # Apply a compiled sequence to one state or to every row of an (N, 54) array
+    return as_state(cube)[..., table]
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from array import array
+
+import numpy as np
+
+from cube_core import MOVE_NAMES, MOVE_TABLE_ARRAY, inverse_move
+
+# A copy of the state is kept every this many moves, so jumping anywhere replays fewer moves than this
+DEFAULT_CHECKPOINT_INTERVAL = 64
+
+# Oldest moves are forgotten beyond this, which keeps the history to about 18 MB at most
+DEFAULT_MAX_MOVES = 10_000_000
+
+
+class MoveHistory:
+    # Moves stored as one byte each, with undo, redo and jumping to any move in the history
+    def __init__(self, start_state: np.ndarray, names=MOVE_NAMES, tables: np.ndarray = MOVE_TABLE_ARRAY,
+                 checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL, max_moves: int = DEFAULT_MAX_MOVES):
+        if len(names) > 256:
+            raise ValueError("A move history can only hold 256 different moves")
+        self.names = tuple(names)
+        self.codes = {name: code for code, name in enumerate(self.names)}
+        self.tables = np.asarray(tables)
+        self.inverses = array("B", [self.codes[inverse_move(name)] for name in self.names])
+        self.checkpoint_interval = checkpoint_interval
+        self.max_moves = max(max_moves, 2 * checkpoint_interval)
+        self.clear(start_state)
+
+    def clear(self, start_state: np.ndarray):
+        # Forget every move and start again from the given state
+        self.state = np.array(start_state, dtype=np.uint8)
+        self.moves = array("B")
+        # Checkpoint i is the state after i * checkpoint_interval moves, all packed into one buffer
+        self.checkpoints = bytearray(self.state.tobytes())
+        self.position = 0
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def push(self, move: str) -> np.ndarray:
+        # Record a new move, dropping any moves that were undone and could have been redone
+        code = self.codes[move]
+        if self.position < len(self.moves):
+            del self.moves[self.position:]
+            del self.checkpoints[(self.position // self.checkpoint_interval + 1) * self.state.size:]
+        self.state = self.state[self.tables[code]]
+        self.moves.append(code)
+        self.position += 1
+        if self.position % self.checkpoint_interval == 0:
+            self.checkpoints += self.state.tobytes()
+        if len(self.moves) > self.max_moves:
+            self._forget_oldest()
+        return self.state
+
+    def _forget_oldest(self):
+        # Drop whole checkpoint intervals from the start, an eighth of the history at a time
+        intervals = min(self.max_moves // 8, self.position) // self.checkpoint_interval
+        if intervals == 0:
+            return
+        moves = intervals * self.checkpoint_interval
+        del self.moves[:moves]
+        del self.checkpoints[:intervals * self.state.size]
+        self.position -= moves
+
+    def undo(self) -> np.ndarray | None:
+        # Step back one move, returning the new state, or None at the start of the history
+        if self.position == 0:
+            return None
+        self.position -= 1
+        self.state = self.state[self.tables[self.inverses[self.moves[self.position]]]]
+        return self.state
+
+    def redo(self) -> np.ndarray | None:
+        # Step forward one undone move, returning the new state, or None when nothing was undone
+        if self.position == len(self.moves):
+            return None
+        self.state = self.state[self.tables[self.moves[self.position]]]
+        self.position += 1
+        return self.state
+
+    def checkpoint(self, index: int) -> np.ndarray:
+        size = self.state.size
+        return np.frombuffer(self.checkpoints, dtype=np.uint8, count=size, offset=index * size).copy()
+
+    def jump(self, position: int) -> np.ndarray:
+        # Go to the state after the given number of moves, replaying at most one checkpoint interval
+        position = min(max(position, 0), len(self.moves))
+        index = position // self.checkpoint_interval
+        state = self.checkpoint(index)
+        for code in self.moves[index * self.checkpoint_interval:position]:
+            state = state[self.tables[code]]
+        self.state = state
+        self.position = position
+        return self.state
+
+    def move_names(self, start: int = 0, stop: int | None = None) -> list:
+        return [self.names[code] for code in self.moves[start:stop]]
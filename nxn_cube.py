@@ -0,0 +1,241 @@
+import functools
+import itertools
+import re
+
+import numpy as np
+
+from cube_core import FACE_ORDER, MOVE_TABLES, SLICE_MOVES, SOLVED_STATE, COLOUR_VALUES, sticker_index
+from cube_cubies import CORNER_FACELETS
+
+# Sizes the NxN mode supports
+MIN_SIZE = 2
+MAX_SIZE = 10
+
+# Outward direction of every face, with x to the right, y to the back and z up as in the 3x3 mesh
+FACE_NORMALS = {"U": (0, 0, 1), "D": (0, 0, -1),
+                "R": (1, 0, 0), "L": (-1, 0, 0),
+                "F": (0, -1, 0), "B": (0, 1, 0)}
+
+# Face turns and whole-cube rotations, which turn the outer layer or every layer about one axis
+LAYER_MOVES = ("U", "D", "F", "B", "L", "R")
+CUBE_ROTATIONS = {"RCX": "U", "RCY": "B"}
+
+# An NxN move is an optional layer count from the face, then the face, slice or rotation, then nothing, ' or 2
+NXN_MOVE_PATTERN = re.compile(r"(\d*)(RCX|RCY|[UDFBLRMES])(['2]?)")
+
+
+def _face_frames() -> dict:
+    # Work out where the TL sticker of every face sits and which ways its rows and columns run,
+    # from the corner pieces the 3x3 stickers belong to, so the NxN order matches the 3x3 one
+    corners = dict()
+    for corner, facelets in CORNER_FACELETS.items():
+        direction = np.sum([FACE_NORMALS[face] for face in corner], axis=0)
+        for face, position in facelets:
+            corners[face, position] = direction - FACE_NORMALS[face]
+    frames = dict()
+    for face in FACE_ORDER:
+        top_left = corners[face, "TL"]
+        right = (corners[face, "TR"] - top_left) // 2
+        down = (corners[face, "BL"] - top_left) // 2
+        frames[face] = (np.array(FACE_NORMALS[face]), top_left, right, down)
+    return frames
+
+
+FACE_FRAMES = _face_frames()
+
+
+def _rotations() -> list:
+    # All 24 proper rotations of the cube as integer matrices
+    matrices = []
+    for axes in itertools.permutations(range(3)):
+        for signs in itertools.product((1, -1), repeat=3):
+            matrix = np.zeros((3, 3), dtype=np.int64)
+            matrix[range(3), axes] = signs
+            if round(np.linalg.det(matrix)) == 1:
+                matrices.append(matrix)
+    return matrices
+
+
+@functools.lru_cache(maxsize=None)
+def sticker_geometry(n: int) -> tuple:
+    # Centre, right and down vectors of every sticker in FACE_ORDER and row-major order
+    # Coordinates are doubled so they stay integers, with faces at +-n and neighbouring stickers 2 apart
+    rows, columns = np.divmod(np.arange(n * n), n)
+    centres = []
+    rights = []
+    downs = []
+    for face in FACE_ORDER:
+        normal, top_left, right, down = FACE_FRAMES[face]
+        centres.append(normal * n + top_left * (n - 1) + right * 2 * columns[:, None] + down * 2 * rows[:, None])
+        rights.append(np.repeat(right[None, :], n * n, axis=0))
+        downs.append(np.repeat(down[None, :], n * n, axis=0))
+    return np.concatenate(centres), np.concatenate(rights), np.concatenate(downs)
+
+
+def solved_state(n: int) -> np.ndarray:
+    # Every face takes the colour of the matching face of the 3x3 cube
+    return np.repeat(SOLVED_STATE[[sticker_index(face, "MM") for face in FACE_ORDER]], n * n)
+
+
+def _position_lookup(n: int, centres: np.ndarray) -> tuple:
+    # Map each doubled coordinate to its sticker index through a flat array
+    side = 2 * n + 1
+    keys = ((centres[:, 0] + n) * side + centres[:, 1] + n) * side + centres[:, 2] + n
+    lookup = np.full(side ** 3, -1, dtype=np.intp)
+    lookup[keys] = np.arange(len(centres))
+    return lookup, side
+
+
+def layer_stickers(n: int, matrix: np.ndarray, layers) -> np.ndarray:
+    # Stickers in the given layers about a rotation's axis, with layer 0 the one furthest along the axis
+    centres, _, _ = sticker_geometry(n)
+    # A quarter turn leaves exactly one axis where it is
+    axis = (np.diag(matrix) == 1).astype(np.int64)
+    depth = (n - 1 - np.clip(centres @ axis, -(n - 1), n - 1)) // 2
+    return np.flatnonzero(np.isin(depth, layers))
+
+
+def layer_table(n: int, matrix: np.ndarray, layers) -> np.ndarray:
+    # Permutation that turns the given layers by a rotation
+    centres, _, _ = sticker_geometry(n)
+    moving = layer_stickers(n, matrix, layers)
+    lookup, side = _position_lookup(n, centres)
+    targets = centres[moving] @ matrix.T
+    keys = ((targets[:, 0] + n) * side + targets[:, 1] + n) * side + targets[:, 2] + n
+    table = np.arange(len(centres))
+    table[lookup[keys]] = moving
+    return table
+
+
+def _quarter_turn_matrices() -> dict:
+    # Find the rotation each 3x3 face turn and cube rotation makes, so NxN moves turn the same way
+    matrices = dict()
+    for move in LAYER_MOVES + tuple(CUBE_ROTATIONS):
+        normal = np.array(FACE_NORMALS[CUBE_ROTATIONS.get(move, move)])
+        axis = np.abs(normal)
+        if move in CUBE_ROTATIONS:
+            layers = range(3)
+        else:
+            layers = [2] if normal.sum() < 0 else [0]
+        for matrix in _rotations():
+            # Only quarter turns about the face's own axis can match
+            if (matrix @ axis != axis).any() or (matrix == np.eye(3)).all():
+                continue
+            if (layer_table(3, matrix, layers) == MOVE_TABLES[move]).all():
+                matrices[move] = matrix
+                break
+        else:
+            raise ValueError(f"No rotation reproduces the 3x3 move {move}")
+    return matrices
+
+
+QUARTER_TURN_MATRICES = _quarter_turn_matrices()
+
+
+def parse_move(move: str) -> tuple:
+    # Split an NxN move into its layer from the face (1 is the face itself), its base move and its suffix
+    match = NXN_MOVE_PATTERN.fullmatch(move)
+    if match is None:
+        raise ValueError(f"Unrecognised move {move!r}")
+    layer, base, suffix = match.groups()
+    if layer and base not in LAYER_MOVES:
+        raise ValueError(f"Only face turns take a layer number, got {move!r}")
+    return int(layer or 1), base, suffix
+
+
+def _turned_layers(n: int, layer: int, base: str):
+    # Layers counted from the positive end of the rotation axis, which is the far side for D, L and F
+    if base in CUBE_ROTATIONS:
+        return range(n)
+    if sum(FACE_NORMALS[base]) < 0:
+        return [n - layer]
+    return [layer - 1]
+
+
+def move_layers(n: int, move: str) -> list:
+    # What a move physically turns, as (rotation, layers, quarter turns) for every group of layers turning together
+    layer, base, suffix = parse_move(move)
+    quarter_turns = {"": 1, "'": -1, "2": 2}[suffix]
+    if base in SLICE_MOVES:
+        return [(matrix, layers, turns * quarter_turns)
+                for part in SLICE_MOVES[base] for matrix, layers, turns in move_layers(n, part)]
+    return [(QUARTER_TURN_MATRICES[base], _turned_layers(n, layer, base), quarter_turns)]
+
+
+@functools.lru_cache(maxsize=None)
+def move_table(n: int, move: str) -> np.ndarray:
+    # Permutation table of any move on an NxN cube, such as U, U', 2U2, M, RCX
+    layer, base, suffix = parse_move(move)
+    if not 1 <= layer <= n:
+        raise ValueError(f"{move} turns layer {layer} of a {n}x{n} cube")
+    if base in SLICE_MOVES:
+        first, second = SLICE_MOVES[base]
+        table = move_table(n, first)[move_table(n, second)]
+    else:
+        table = layer_table(n, QUARTER_TURN_MATRICES[base], _turned_layers(n, layer, base))
+    if suffix == "2":
+        table = table[table]
+    elif suffix == "'":
+        table = np.argsort(table)
+    table.flags.writeable = False
+    return table
+
+
+def move_names(n: int) -> list:
+    # Every face turn of every layer that is not the middle of an odd cube, plus slices and cube rotations
+    moves = []
+    for face in LAYER_MOVES:
+        for layer in range(1, n // 2 + 1):
+            prefix = str(layer) if layer > 1 else ""
+            moves.extend(prefix + face + suffix for suffix in ("", "'", "2"))
+    for base in list(SLICE_MOVES) + list(CUBE_ROTATIONS):
+        moves.extend(base + suffix for suffix in ("", "'", "2"))
+    return moves
+
+
+def apply_move(n: int, state: np.ndarray, move: str) -> np.ndarray:
+    return state[..., move_table(n, move)]
+
+
+def compose_moves(n: int, moves) -> np.ndarray:
+    table = np.arange(6 * n * n)
+    for move in moves:
+        table = table[move_table(n, move)]
+    return table
+
+
+def apply_moves(n: int, state: np.ndarray, moves) -> np.ndarray:
+    # Apply a whole sequence with one gather
+    return state[..., compose_moves(n, moves)]
+
+
+def random_moves(n: int, count: int = 100, rng: np.random.Generator | None = None) -> list:
+    # Random quarter turns of every layer, so big cubes are scrambled all the way through
+    rng = rng or np.random.default_rng()
+    faces = rng.choice(LAYER_MOVES, count)
+    layers = rng.integers(1, max(n // 2, 1) + 1, count)
+    suffixes = rng.choice(["", "'"], count)
+    return [(str(layer) if layer > 1 else "") + face + suffix for face, layer, suffix in zip(faces, layers, suffixes)]
+
+
+def mesh_arrays(n: int) -> tuple:
+    # Points and cells of one quad per sticker, in the same coordinates as the 3x3 mesh (0 to n along each axis)
+    centres, rights, downs = sticker_geometry(n)
+    corners = np.stack([centres - rights - downs, centres + rights - downs,
+                        centres + rights + downs, centres - rights + downs], axis=1)
+    points = ((corners.reshape(-1, 3) + n) / 2).astype(np.float64)
+    cells = np.hstack([np.full((len(centres), 1), 4), np.arange(4 * len(centres)).reshape(-1, 4)]).ravel()
+    return points, cells
+
+
+def generate_mesh(n: int, state: np.ndarray):
+    # Mesh with one cell per sticker in state order, so colouring needs no reordering
+    import pyvista as pv
+    points, cells = mesh_arrays(n)
+    mesh = pv.PolyData(points, cells)
+    mesh.cell_data['colors'] = COLOUR_VALUES[state]
+    return mesh
+
+
+def colour_mesh(mesh, state: np.ndarray):
+    mesh.cell_data['colors'][:] = COLOUR_VALUES[state]
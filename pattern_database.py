@@ -0,0 +1,258 @@
+import argparse
+import itertools
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cube_core import SOLVED_STATE, as_state
+from cube_cubies import EDGES, MOVE_CUBIES, permutation_rank, states_to_cubies
+from cube_solver import SOLVER_MOVES, TWISTS, get_tables, twist_coordinate
+
+# Depths are stored two to a byte, with every bit set meaning not reached yet
+DEPTH_BITS = 4
+UNVISITED = (1 << DEPTH_BITS) - 1
+
+# Entries handled at a time, which bounds the memory any one process uses whatever the database size
+CHUNK_ENTRIES = 1 << 20
+
+# Pushing a frontier entry costs about this many times as much as pulling an unreached one, which stops at
+# the first move that reaches the frontier, so pulling takes over while the frontier is still the smaller set
+PUSH_COST = 4
+
+# The most edges a subset may track, since the tables grow as 12!/(12-k)! * 2^k
+MAX_PATTERN_EDGES = 7
+DEFAULT_PATTERN_EDGES = ("UR", "UF", "UL", "UB", "DR", "DF")
+
+# Set in each worker by _open_database
+worker_tables = None
+worker_depths = None
+
+
+def corner_tables() -> dict:
+    # Corner permutation times corner twist, using the solver's move tables
+    tables = get_tables()
+    return {"permutation": np.asarray(tables["corners"]),
+            "orientation": np.asarray(tables["twist"]),
+            "orientations": TWISTS}
+
+
+def edge_tables(edges=DEFAULT_PATTERN_EDGES) -> dict:
+    # Positions and flips of a subset of the edges, with the others ignored
+    # Flips are stored per tracked edge rather than per position, so a move XORs them with a mask that depends only
+    # on where the tracked edges are
+    pieces = [EDGES.index(edge) for edge in edges]
+    if not 1 <= len(pieces) <= MAX_PATTERN_EDGES or len(set(pieces)) != len(pieces):
+        raise ValueError(f"Pick between 1 and {MAX_PATTERN_EDGES} different edges from {', '.join(EDGES)}")
+    positions = np.array(list(itertools.permutations(range(len(EDGES)), len(pieces))), dtype=np.intp)
+    permutation = []
+    masks = []
+    flip_bits = 1 << np.arange(len(pieces) - 1, -1, -1)
+    for move in SOLVER_MOVES:
+        _, _, move_ep, move_eo = MOVE_CUBIES[move]
+        # The piece at position p ends up where move_ep points back to p, and flips if that position says so
+        destinations = np.argsort(move_ep)[positions]
+        permutation.append(partial_permutation_rank(destinations, len(EDGES)))
+        masks.append((move_eo[destinations] * flip_bits).sum(axis=1))
+    return {"permutation": np.stack(permutation, axis=1).astype(np.uint32),
+            "flip_masks": np.stack(masks, axis=1).astype(np.uint8),
+            "orientations": 1 << len(pieces),
+            "pieces": np.array(pieces, dtype=np.intp)}
+
+
+def partial_permutation_rank(positions: np.ndarray, size: int) -> np.ndarray:
+    # Lexicographic rank of every row of k distinct values from range(size), matching itertools.permutations order
+    positions = np.atleast_2d(positions)
+    length = positions.shape[1]
+    ranks = np.zeros(len(positions), dtype=np.int64)
+    for index in range(length):
+        smaller = positions[:, index] - (positions[:, :index] < positions[:, index:index + 1]).sum(axis=1)
+        ranks += smaller * (math.perm(size - 1 - index, length - 1 - index))
+    return ranks
+
+
+def database_size(tables: dict) -> int:
+    return len(tables["permutation"]) * tables["orientations"]
+
+
+def neighbours(tables: dict, indices: np.ndarray, move: int) -> np.ndarray:
+    # The entries one move away from each index, for the move numbered in SOLVER_MOVES
+    permutation, orientation = np.divmod(indices, tables["orientations"])
+    moved = tables["permutation"][permutation, move].astype(np.int64) * tables["orientations"]
+    if "flip_masks" in tables:
+        return moved + (orientation ^ tables["flip_masks"][permutation, move])
+    return moved + tables["orientation"][orientation, move]
+
+
+def state_indices(tables: dict, states: np.ndarray) -> np.ndarray:
+    # Database entry of every (N, 54) state
+    cp, co, ep, eo = states_to_cubies(np.atleast_2d(as_state(states)))
+    if "flip_masks" in tables:
+        positions = np.argsort(ep, axis=1)[:, tables["pieces"]]
+        flips = np.take_along_axis(eo, positions, axis=1)
+        flip_bits = 1 << np.arange(len(tables["pieces"]) - 1, -1, -1)
+        ranks = partial_permutation_rank(positions, len(EDGES))
+        return ranks * tables["orientations"] + (flips * flip_bits).sum(axis=1)
+    return permutation_rank(cp) * tables["orientations"] + twist_coordinate(co)
+
+
+def unpack_depths(packed: np.ndarray) -> np.ndarray:
+    # Low nibble first, so entry i lives in byte i // 2
+    return np.stack([packed & 0xF, packed >> 4], axis=1).ravel()
+
+
+def pack_depths(depths: np.ndarray) -> np.ndarray:
+    return (depths[0::2] | depths[1::2] << 4).astype(np.uint8)
+
+
+def read_depths(packed: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    return packed[indices >> 1] >> ((indices & 1) << 2).astype(np.uint8) & 0xF
+
+
+def _save_tables(tables: dict, directory: str) -> dict:
+    # Workers map the move tables from disk rather than each building or unpickling their own
+    paths = dict()
+    for name, table in tables.items():
+        if isinstance(table, np.ndarray):
+            paths[name] = os.path.join(directory, f"{name}.npy")
+            np.save(paths[name], table)
+        else:
+            paths[name] = table
+    return paths
+
+
+def _load_tables(paths: dict) -> dict:
+    return {name: np.load(path, mmap_mode="r") if isinstance(path, str) else path for name, path in paths.items()}
+
+
+def _open_database(table_paths: dict, path: str):
+    global worker_tables, worker_depths
+    worker_tables = _load_tables(table_paths)
+    worker_depths = np.load(path, mmap_mode="r+")
+
+
+def _pull_chunk(start: int, end: int, depth: int) -> int:
+    # Give depth + 1 to every unreached entry in bytes [start, end) that is one move from an entry at depth
+    # Each worker writes only its own bytes, and entries elsewhere can only change from unreached to depth + 1,
+    # so nothing a worker reads is ever mistaken for the depth it is looking for
+    depths = unpack_depths(worker_depths[start:end])
+    candidates = np.flatnonzero(depths == UNVISITED)
+    indices = candidates + 2 * start
+    found = 0
+    for move in range(len(SOLVER_MOVES)):
+        if not len(indices):
+            break
+        reached = read_depths(worker_depths, neighbours(worker_tables, indices, move)) == depth
+        depths[candidates[reached]] = depth + 1
+        found += np.count_nonzero(reached)
+        candidates = candidates[~reached]
+        indices = indices[~reached]
+    if found:
+        worker_depths[start:end] = pack_depths(depths)
+    return found
+
+
+def _push_level(tables: dict, packed: np.ndarray, depth: int) -> int:
+    # Expand the entries at depth forwards, which is cheaper than pulling while the frontier is small
+    found = 0
+    for start in range(0, len(packed), CHUNK_ENTRIES // 2):
+        frontier = np.flatnonzero(unpack_depths(packed[start:start + CHUNK_ENTRIES // 2]) == depth) + 2 * start
+        for move in range(len(SOLVER_MOVES)):
+            reached = neighbours(tables, frontier, move)
+            reached = np.unique(reached[read_depths(packed, reached) == UNVISITED])
+            found += len(reached)
+            # Even and odd entries share bytes, so they are written separately to keep both nibbles
+            for parity in (0, 1):
+                entries = reached[reached & 1 == parity]
+                shift = 4 * parity
+                packed[entries >> 1] = packed[entries >> 1] & (0xF0 >> shift) | (depth + 1) << shift
+    return found
+
+
+def build_pattern_database(tables: dict, path: str, workers: int | None = None, log=None) -> list:
+    # Breadth-first search from the solved cube, writing 4 bit depths to a memory-mapped .npy file
+    # Returns the number of entries found at each depth
+    workers = workers or os.cpu_count() or 1
+    size = database_size(tables)
+    packed = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=((size + 1) // 2,))
+    packed[:] = 0xFF
+    solved = int(state_indices(tables, SOLVED_STATE)[0])
+    packed[solved >> 1] &= 0xF0 if solved & 1 == 0 else 0x0F
+    packed.flush()
+    counts = [1]
+    unvisited = size - 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        table_paths = _save_tables(tables, directory)
+        # Spawned workers import only numpy and the move definitions
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_open_database,
+                                 initargs=(table_paths, path)) as executor:
+            depth = 0
+            while counts[-1] and unvisited:
+                start = time.perf_counter()
+                # Pull once the frontier outweighs the unreached entries each worker would have to check
+                if counts[-1] * PUSH_COST * workers < unvisited:
+                    method = "push"
+                    found = _push_level(tables, packed, depth)
+                else:
+                    method = "pull"
+                    packed.flush()
+                    chunks = [(offset, min(offset + CHUNK_ENTRIES // 2, len(packed)), depth)
+                              for offset in range(0, len(packed), CHUNK_ENTRIES // 2)]
+                    found = sum(executor.map(_pull_chunk, *zip(*chunks)))
+                counts.append(int(found))
+                unvisited -= found
+                depth += 1
+                if log is not None:
+                    log(f"depth {depth:2}: {found:12,} entries by {method} in {time.perf_counter() - start:7.2f}s")
+    if not counts[-1]:
+        counts.pop()
+    packed.flush()
+    return counts
+
+
+class PatternDatabase:
+    # Memory-mapped depths, looked up by cube state
+    def __init__(self, path: str, tables: dict):
+        self.tables = tables
+        self.packed = np.load(path, mmap_mode="r")
+        if len(self.packed) != (database_size(tables) + 1) // 2:
+            raise ValueError(f"{path} does not match the pattern's size")
+
+    def depths(self, states: np.ndarray) -> np.ndarray:
+        # A lower bound on the moves needed to solve each state
+        return read_depths(self.packed, state_indices(self.tables, states))
+
+    def depth(self, cube) -> int:
+        return int(self.depths(as_state(cube))[0])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build a pattern database by breadth-first search.")
+    parser.add_argument("pattern", choices=("corners", "edges"), help="which pieces the database tracks")
+    parser.add_argument("-o", "--output", required=True, help="the .npy file to write")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--edges", nargs="+", default=DEFAULT_PATTERN_EDGES, metavar="EDGE",
+                        help=f"edges an edge database tracks (default: {' '.join(DEFAULT_PATTERN_EDGES)})")
+    args = parser.parse_args(argv)
+
+    try:
+        tables = corner_tables() if args.pattern == "corners" else edge_tables(args.edges)
+    except ValueError as error:
+        parser.error(str(error))
+    start = time.perf_counter()
+    counts = build_pattern_database(tables, args.output, args.workers,
+                                    log=lambda line: print(line, file=sys.stderr, flush=True))
+    print(f"{sum(counts):,} entries, deepest {len(counts) - 1}, in {time.perf_counter() - start:.1f}s",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,114 +1,36 @@
-import copy
-import random
+from __future__ import annotations
+
+import argparse
+import collections
+import functools
+import multiprocessing
 import sys
 import time
+from concurrent import futures
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
 
-import pyvista as pv
-from pyvistaqt import plotting
-from PyQt6 import QtWidgets
 import numpy as np
 
-# Define possible moves
-MOVES = {"U", "D", "F", "B", "L", "R"}
-
-# Define colours for the cube
-COLOURS = {"Red": [255, 0, 0],
-           "Green": [0, 255, 0],
-           "Blue": [0, 0, 255],
-           "Yellow": [255, 255, 0],
-           "White": [255, 255, 255],
-           "Orange": [255, 128, 0]}
-
-# Define the starting colours of the cube
-START_CUBE = {
-        # Red Side (Front)
-        "F": {
-            "TL": "Red", "TM": "Red", "TR": "Red",
-            "ML": "Red", "MM": "Red", "MR": "Red",
-            "BL": "Red", "BM": "Red", "BR": "Red"
-            },
-
-        # Green Side (Left)
-        "L": {
-            "TL": "Green", "TM": "Green", "TR": "Green",
-            "ML": "Green", "MM": "Green", "MR": "Green",
-            "BL": "Green", "BM": "Green", "BR": "Green"
-            },
-
-        # White Side (Up)
-        "U": {
-            "TL": "White", "TM": "White", "TR": "White",
-            "ML": "White", "MM": "White", "MR": "White",
-            "BL": "White", "BM": "White", "BR": "White"
-            },
-
-        # Blue Side (Right)
-        "R": {
-            "TL": "Blue", "TM": "Blue", "TR": "Blue",
-            "ML": "Blue", "MM": "Blue", "MR": "Blue",
-            "BL": "Blue", "BM": "Blue", "BR": "Blue"
-            },
-
-        # Yellow Side (Down)
-        "D": {
-            "TL": "Yellow", "TM": "Yellow", "TR": "Yellow",
-            "ML": "Yellow", "MM": "Yellow", "MR": "Yellow",
-            "BL": "Yellow", "BM": "Yellow", "BR": "Yellow"
-            },
-
-        # Orange Side (Back)
-        "B": {
-            "TL": "Orange", "TM": "Orange", "TR": "Orange",
-            "ML": "Orange", "MM": "Orange", "MR": "Orange",
-            "BL": "Orange", "BM": "Orange", "BR": "Orange"
-            }
-        }
-
-# Define the neighbours of different cube faces
-CUBE_NEIGHBOURS = {
-                    "F":
-                    {
-                        "U": ["U", "BL", "BM", "BR"],
-                        "D": ["D", "TL", "TM", "TR"],
-                        "L": ["L", "TR", "MR", "BR"],
-                        "R": ["R", "TL", "ML", "BL"]
-                    },
-                    "B":
-                    {
-                        "U": ["U", "TR", "TM", "TL"],
-                        "D": ["D", "BR", "BM", "BL"],
-                        "L": ["R", "TR", "MR", "BR"],
-                        "R": ["L", "TL", "ML", "BL"]
-                    },
-                    "U":
-                    {
-                        "U": ["B", "TR", "TM", "TL"],
-                        "D": ["F", "TL", "TM", "TR"],
-                        "L": ["L", "TL", "TM", "TR"],
-                        "R": ["R", "TR", "TM", "TL"]
-                    },
-                    "D":
-                    {
-                        "U": ["F", "BL", "BM", "BR"],
-                        "D": ["B", "BR", "BM", "BL"],
-                        "L": ["L", "BR", "BM", "BL"],
-                        "R": ["R", "BL", "BM", "BR"]
-                    },
-                    "L":
-                    {
-                        "U": ["U", "TL", "ML", "BL"],
-                        "D": ["D", "BL", "ML", "TL"],
-                        "L": ["B", "TR", "MR", "BR"],
-                        "R": ["F", "TL", "ML", "BL"]
-                    },
-                    "R":
-                    {
-                        "U": ["U", "BR", "MR", "TR"],
-                        "D": ["D", "TR", "MR", "BR"],
-                        "L": ["F", "TR", "MR", "BR"],
-                        "R": ["B", "TL", "ML", "BL"]
-                    }
-                    }
+import cube_animation
+import cube_orientation
+import cube_profiler
+import cube_validation
+import nxn_cube
+from cube_core import (SLICE_MOVES, SOLVED_STATE, COLOUR_VALUES, as_state, apply_move, sticker_index,
+                       move_name, quarter_turns, random_moves, split_move)
+from cube_animation import TurnAnimation
+from cube_profiler import profiled
+from cube_scrambler import random_state
+from cube_solver import solve
+from move_history import MoveHistory
+from solution_cache import DEFAULT_CACHE_PATH, SolutionCache
+
+# The visualization layer is only imported once a window is actually needed
+if TYPE_CHECKING:
+    import pyvista as pv
+    from pyvistaqt import plotting
+    from PyQt6 import QtCore, QtWidgets
 
 # Define where each face is located in the model
 CUBE_COORDINATES = {"F":
@@ -202,249 +124,283 @@ FACES = np.hstack([  # Front
                     [4, 88, 89, 93, 92], [4, 89, 90, 94, 93], [4, 90, 91, 95, 94]   # R3
                     ])
 
+# Define which sticker is drawn on each cell of the mesh
+MESH_ORDER = [
+              # Front
+              ("F", "BL"), ("F", "BM"), ("F", "BR"),  # R1
+              ("F", "ML"), ("F", "MM"), ("F", "MR"),  # R2
+              ("F", "TL"), ("F", "TM"), ("F", "TR"),  # R3
+              # Back
+              ("B", "BR"), ("B", "BM"), ("B", "BL"),  # R1
+              ("B", "MR"), ("B", "MM"), ("B", "ML"),  # R2
+              ("B", "TR"), ("B", "TM"), ("B", "TL"),  # R3
+              # Left
+              ("L", "BR"), ("L", "BM"), ("L", "BL"),  # R1
+              ("L", "MR"), ("L", "MM"), ("L", "ML"),  # R2
+              ("L", "TR"), ("L", "TM"), ("L", "TL"),  # R3
+              # Right
+              ("R", "BL"), ("R", "BM"), ("R", "BR"),  # R1
+              ("R", "ML"), ("R", "MM"), ("R", "MR"),  # R2
+              ("R", "TL"), ("R", "TM"), ("R", "TR"),  # R3
+              # Up
+              ("U", "BL"), ("U", "BM"), ("U", "BR"),  # R1
+              ("U", "ML"), ("U", "MM"), ("U", "MR"),  # R2
+              ("U", "TL"), ("U", "TM"), ("U", "TR"),  # R3
+              # Down
+              ("D", "TL"), ("D", "TM"), ("D", "TR"),  # R3
+              ("D", "ML"), ("D", "MM"), ("D", "MR"),  # R2
+              ("D", "BL"), ("D", "BM"), ("D", "BR")]  # R1
+MESH_STICKERS = np.array([sticker_index(face, position) for face, position in MESH_ORDER], dtype=np.intp)
+
+# The drawn mesh gives every cell its own corners so a turning layer can be moved on its own
+MESH_POINTS, MESH_CELLS = cube_animation.unshared_mesh(VERTICES, FACES)
+
+
+# Number of stickers along each edge of the game cube
+cube_size = 3
 
 # Initialise a global variable for the game cube based on a solved cube
-current_cube = dict()
-
-# Variable to track moves
-user_moves = []
-
-
-def generate_mesh(cube: dict) -> pv.PolyData:
-    mesh = pv.PolyData(VERTICES, FACES)
-    mesh.cell_data['colors'] = [
-                                # Front
-                                COLOURS[cube["F"]["BL"]], COLOURS[cube["F"]["BM"]], COLOURS[cube["F"]["BR"]],  # R1
-                                COLOURS[cube["F"]["ML"]], COLOURS[cube["F"]["MM"]], COLOURS[cube["F"]["MR"]],  # R2
-                                COLOURS[cube["F"]["TL"]], COLOURS[cube["F"]["TM"]], COLOURS[cube["F"]["TR"]],  # R3
-                                # Back
-                                COLOURS[cube["B"]["BR"]], COLOURS[cube["B"]["BM"]], COLOURS[cube["B"]["BL"]],  # R1
-                                COLOURS[cube["B"]["MR"]], COLOURS[cube["B"]["MM"]], COLOURS[cube["B"]["ML"]],  # R2
-                                COLOURS[cube["B"]["TR"]], COLOURS[cube["B"]["TM"]], COLOURS[cube["B"]["TL"]],  # R3
-                                # Left
-                                COLOURS[cube["L"]["BR"]], COLOURS[cube["L"]["BM"]], COLOURS[cube["L"]["BL"]],  # R1
-                                COLOURS[cube["L"]["MR"]], COLOURS[cube["L"]["MM"]], COLOURS[cube["L"]["ML"]],  # R2
-                                COLOURS[cube["L"]["TR"]], COLOURS[cube["L"]["TM"]], COLOURS[cube["L"]["TL"]],  # R3
-                                # Right
-                                COLOURS[cube["R"]["BL"]], COLOURS[cube["R"]["BM"]], COLOURS[cube["R"]["BR"]],  # R1
-                                COLOURS[cube["R"]["ML"]], COLOURS[cube["R"]["MM"]], COLOURS[cube["R"]["MR"]],  # R2
-                                COLOURS[cube["R"]["TL"]], COLOURS[cube["R"]["TM"]], COLOURS[cube["R"]["TR"]],  # R3
-                                # Up
-                                COLOURS[cube["U"]["BL"]], COLOURS[cube["U"]["BM"]], COLOURS[cube["U"]["BR"]],  # R1
-                                COLOURS[cube["U"]["ML"]], COLOURS[cube["U"]["MM"]], COLOURS[cube["U"]["MR"]],  # R2
-                                COLOURS[cube["U"]["TL"]], COLOURS[cube["U"]["TM"]], COLOURS[cube["U"]["TR"]],  # R3
-                                # Down
-                                COLOURS[cube["D"]["TL"]], COLOURS[cube["D"]["TM"]], COLOURS[cube["D"]["TR"]],  # R3
-                                COLOURS[cube["D"]["ML"]], COLOURS[cube["D"]["MM"]], COLOURS[cube["D"]["MR"]],  # R2
-                                COLOURS[cube["D"]["BL"]], COLOURS[cube["D"]["BM"]], COLOURS[cube["D"]["BR"]]]  # R1
+current_cube = SOLVED_STATE.copy()
+
+# Which of the 24 ways the cube is being held, so turning the whole cube never touches current_cube
+# current_cube stays in the frame it started in, and is only relabelled to the view when drawn or exported
+orientation = cube_orientation.IDENTITY
+
+# Every move made, for undo, redo and going back to any earlier move
+history = MoveHistory(current_cube)
+
+# Solutions already found, so solving a position seen before (even rotated or mirrored) is instant
+solution_cache = SolutionCache(path=DEFAULT_CACHE_PATH)
+
+# The one mesh drawn by the plotter, recoloured in place after every move
+cube_mesh = None
+
+# Default playback speed for scrambles and solutions
+DEFAULT_MOVES_PER_SECOND = 10
+
+# Whether turns in the window are animated, and the animator that plays them once the window exists
+animate_turns = True
+turn_animator = None
+
+# Depth of nested batched operations and the plotter waiting for a redraw once they end
+batch_depth = 0
+pending_plotter = None
+
+
+def generate_mesh(cube) -> pv.PolyData:
+    import pyvista as pv
+    if cube_size != 3:
+        return nxn_cube.generate_mesh(cube_size, as_state(cube))
+    mesh = pv.PolyData(MESH_POINTS.copy(), MESH_CELLS)
+    mesh.cell_data['colors'] = COLOUR_VALUES[as_state(cube)[MESH_STICKERS]]
     return mesh
 
 
-def update_mesh(plotter: plotting.QtInteractor) -> plotting.QtInteractor:
-    global current_cube
-    plotter.add_mesh(generate_mesh(cube=current_cube),
-                     scalars='colors',
-                     lighting=False,
-                     rgb=True,
-                     preference='cell',
-                     show_edges=True)
+def colour_mesh(mesh: pv.PolyData, cube):
+    # Write the sticker colours straight into the existing colour buffer
+    if cube_size != 3:
+        nxn_cube.colour_mesh(mesh, as_state(cube))
+        return
+    mesh.cell_data['colors'][:] = COLOUR_VALUES[as_state(cube)[MESH_STICKERS]]
+
+
+def turn(cube, move: str) -> np.ndarray:
+    # The 3x3 uses its own move tables, other sizes use the ones generated for their size
+    if cube_size == 3:
+        return apply_move(cube, move)
+    return nxn_cube.apply_move(cube_size, as_state(cube), move)
+
+
+def scramble_moves(count: int = 100) -> list:
+    # Bigger cubes need their inner layers turned as well to be properly scrambled
+    if cube_size == 3:
+        return random_moves(count)
+    return nxn_cube.random_moves(cube_size, count)
+
+
+@contextmanager
+def batch_updates():
+    # Defer every update_mesh call until the outermost batch ends, then redraw once
+    global batch_depth
+    global pending_plotter
+    batch_depth += 1
+    try:
+        yield
+    finally:
+        batch_depth -= 1
+        if batch_depth == 0 and pending_plotter is not None:
+            plotter = pending_plotter
+            pending_plotter = None
+            update_mesh(plotter)
+
+
+def batched(function):
+    # Run the whole function as one batch so it redraws at most once
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with batch_updates():
+            return function(*args, **kwargs)
+    return wrapper
+
+
+@profiled()
+def update_mesh(plotter: plotting.QtInteractor | None) -> plotting.QtInteractor | None:
+    global pending_plotter
+    # Nothing to draw when the cube is used headless
+    if plotter is None or cube_mesh is None:
+        return plotter
+    if batch_depth > 0:
+        pending_plotter = plotter
+        return plotter
+    colour_mesh(cube_mesh, shown_cube())
+    cube_profiler.count("render")
+    plotter.render()
     return plotter
 
 
 def generate_model() -> plotting.QtInteractor:
-    global current_cube
+    from pyvistaqt import plotting
+    global cube_mesh
     plotter = plotting.QtInteractor(auto_update=True)
-    plotter = update_mesh(plotter=plotter)
+    actor = plotter.add_mesh(generate_mesh(cube=current_cube),
+                             scalars='colors',
+                             lighting=False,
+                             rgb=True,
+                             preference='cell',
+                             show_edges=True)
+    # Keep hold of the dataset the actor draws so moves only touch its colours
+    cube_mesh = actor.mapper.dataset
     return plotter
 
 
-def rotate_cube_x(plotter: plotting.QtInteractor, cube: dict):
-    global current_cube
-    # rotate cube on x axis
-    new_cube = copy.deepcopy(cube)
-    new_cube["F"] = cube["R"]
-    new_cube["R"] = cube["B"]
-    new_cube["B"] = cube["L"]
-    new_cube["L"] = cube["F"]
-    new_cube = rotate_face("U", plotter, new_cube)
-    new_cube = reverse_rotate_face("D", plotter, new_cube)
-    current_cube = new_cube
-    plotter = update_mesh(plotter=plotter)
+def shown_cube() -> np.ndarray:
+    # The cube as seen, with the stickers relabelled for the orientation it is held in
+    if orientation == cube_orientation.IDENTITY:
+        return current_cube
+    return cube_orientation.view_state(cube_size, orientation, current_cube)
 
 
-def reverse_rotate_cube_x(plotter: plotting.QtInteractor, cube: dict):
-    global current_cube
-    # rotate cube on x axis
-    new_cube = copy.deepcopy(cube)
-    new_cube["F"] = cube["L"]
-    new_cube["L"] = cube["B"]
-    new_cube["B"] = cube["R"]
-    new_cube["R"] = cube["F"]
-    new_cube = reverse_rotate_face("U", plotter, new_cube)
-    new_cube = rotate_face("D", plotter, new_cube)
-    current_cube = new_cube
+def cube_move(move: str) -> str:
+    # The move on current_cube that makes a move on the cube as seen
+    return cube_orientation.cube_move(cube_size, orientation, move)
+
+
+def shown_move(move: str) -> str:
+    # The move as seen that makes a move on current_cube, such as one from the solver
+    return cube_orientation.view_move(cube_size, orientation, move)
+
+
+def rotate_whole_cube(plotter: plotting.QtInteractor, move: str):
+    global orientation
+    orientation = cube_orientation.rotate(cube_size, orientation, move)
     plotter = update_mesh(plotter=plotter)
 
 
-def rotate_cube_y(plotter: plotting.QtInteractor, cube: dict):
+def rotate_cube_x(plotter: plotting.QtInteractor):
+    rotate_whole_cube(plotter, "RCX")
+
+
+def reverse_rotate_cube_x(plotter: plotting.QtInteractor):
+    rotate_whole_cube(plotter, "RCX'")
+
+
+def rotate_cube_y(plotter: plotting.QtInteractor):
+    rotate_whole_cube(plotter, "RCY")
+
+
+def reverse_rotate_cube_y(plotter: plotting.QtInteractor):
+    rotate_whole_cube(plotter, "RCY'")
+
+
+@profiled()
+def rotate_side(side: str, plotter: plotting.QtInteractor, cube):
     global current_cube
-    # rotate cube on x axis
-    new_cube = copy.deepcopy(cube)
-    new_cube["R"] = cube["D"]
-    new_cube = reverse_rotate_face("R", plotter, new_cube)
-    new_cube["U"] = cube["R"]
-    new_cube = reverse_rotate_face("U", plotter, new_cube)
-    new_cube["L"] = cube["U"]
-    new_cube = reverse_rotate_face("L", plotter, new_cube)
-    new_cube["D"] = cube["L"]
-    new_cube = reverse_rotate_face("D", plotter, new_cube)
-    new_cube = rotate_face("B", plotter, new_cube)
-    new_cube = reverse_rotate_face("F", plotter, new_cube)
-    current_cube = new_cube
+    # one rotation clockwise
+    current_cube = turn(cube, cube_move(side))
     plotter = update_mesh(plotter=plotter)
 
 
-def reverse_rotate_cube_y(plotter: plotting.QtInteractor, cube: dict):
+@profiled()
+def reverse_rotate_side(side: str, plotter: plotting.QtInteractor, cube):
     global current_cube
-    # rotate cube on x axis
-    new_cube = copy.deepcopy(cube)
-    new_cube["R"] = cube["U"]
-    new_cube = rotate_face("R", plotter, new_cube)
-    new_cube["U"] = cube["L"]
-    new_cube = rotate_face("U", plotter, new_cube)
-    new_cube["L"] = cube["D"]
-    new_cube = rotate_face("L", plotter, new_cube)
-    new_cube["D"] = cube["R"]
-    new_cube = rotate_face("D", plotter, new_cube)
-    new_cube = reverse_rotate_face("B", plotter, new_cube)
-    new_cube = rotate_face("F", plotter, new_cube)
-    current_cube = new_cube
+    # one rotation anticlockwise
+    current_cube = turn(cube, cube_move(side + "'"))
     plotter = update_mesh(plotter=plotter)
 
 
-def rotate_face(side: str, plotter: plotting.QtInteractor, cube: dict):
-    global current_cube
-    # one rotation clockwise
-    new_cube = copy.deepcopy(cube)
-    # Face top row
-    new_cube[side]["TL"] = cube[side]["BL"]
-    new_cube[side]["TM"] = cube[side]["ML"]
-    new_cube[side]["TR"] = cube[side]["TL"]
-    # Face middle row
-    new_cube[side]["ML"] = cube[side]["BM"]
-    new_cube[side]["MM"] = cube[side]["MM"]
-    new_cube[side]["MR"] = cube[side]["TM"]
-    # Face bottom row
-    new_cube[side]["BL"] = cube[side]["BR"]
-    new_cube[side]["BM"] = cube[side]["MR"]
-    new_cube[side]["BR"] = cube[side]["TR"]
-    return new_cube
-
-
-def reverse_rotate_face(side: str, plotter: plotting.QtInteractor, cube: dict):
+@batched
+def randomise_cube(plotter: plotting.QtInteractor | None = None, seed=None):
     global current_cube
-    # one rotation clockwise
-    new_cube = copy.deepcopy(cube)
-    # Face top row
-    new_cube[side]["TL"] = cube[side]["TR"]
-    new_cube[side]["TM"] = cube[side]["MR"]
-    new_cube[side]["TR"] = cube[side]["BR"]
-    # Face middle row
-    new_cube[side]["ML"] = cube[side]["TM"]
-    new_cube[side]["MM"] = cube[side]["MM"]
-    new_cube[side]["MR"] = cube[side]["BM"]
-    # Face bottom row
-    new_cube[side]["BL"] = cube[side]["TL"]
-    new_cube[side]["BM"] = cube[side]["ML"]
-    new_cube[side]["BR"] = cube[side]["BL"]
-    return new_cube
-
-
-def rotate_side(side: str, plotter: plotting.QtInteractor, cube: dict):
+    finish_turn()
+    # The 3x3 jumps straight to a uniformly random position, and the history starts again from it
+    if cube_size == 3:
+        current_cube = random_state(seed)
+        history.clear(current_cube)
+        plotter = update_mesh(plotter=plotter)
+        return
+    for move in scramble_moves(100):
+        cube_rotation(plotter, *split_move(move), "Y")
+
+
+def reset_cube(plotter: plotting.QtInteractor | None = None):
     global current_cube
-    # one rotation clockwise
-    new_cube = copy.deepcopy(cube)
-    neighbours_u = list(CUBE_NEIGHBOURS[side]["U"])
-    neighbours_d = list(CUBE_NEIGHBOURS[side]["D"])
-    neighbours_l = list(CUBE_NEIGHBOURS[side]["L"])
-    neighbours_r = list(CUBE_NEIGHBOURS[side]["R"])
-    new_cube = rotate_face(side, plotter, cube)
-    # Up
-    new_cube[neighbours_u[0]][neighbours_u[1]] = cube[neighbours_l[0]][neighbours_l[3]]
-    new_cube[neighbours_u[0]][neighbours_u[2]] = cube[neighbours_l[0]][neighbours_l[2]]
-    new_cube[neighbours_u[0]][neighbours_u[3]] = cube[neighbours_l[0]][neighbours_l[1]]
-    # Down
-    new_cube[neighbours_d[0]][neighbours_d[1]] = cube[neighbours_r[0]][neighbours_r[3]]
-    new_cube[neighbours_d[0]][neighbours_d[2]] = cube[neighbours_r[0]][neighbours_r[2]]
-    new_cube[neighbours_d[0]][neighbours_d[3]] = cube[neighbours_r[0]][neighbours_r[1]]
-    # Left
-    new_cube[neighbours_l[0]][neighbours_l[1]] = cube[neighbours_d[0]][neighbours_d[1]]
-    new_cube[neighbours_l[0]][neighbours_l[2]] = cube[neighbours_d[0]][neighbours_d[2]]
-    new_cube[neighbours_l[0]][neighbours_l[3]] = cube[neighbours_d[0]][neighbours_d[3]]
-    # Right
-    new_cube[neighbours_r[0]][neighbours_r[1]] = cube[neighbours_u[0]][neighbours_u[1]]
-    new_cube[neighbours_r[0]][neighbours_r[2]] = cube[neighbours_u[0]][neighbours_u[2]]
-    new_cube[neighbours_r[0]][neighbours_r[3]] = cube[neighbours_u[0]][neighbours_u[3]]
-    current_cube = new_cube
+    global orientation
+    finish_turn()
+    # Set the game cube to the start cube, held the way it started
+    current_cube = nxn_cube.solved_state(cube_size)
+    orientation = cube_orientation.IDENTITY
     plotter = update_mesh(plotter=plotter)
+    history.clear(current_cube)
+
 
+def new_history(state: np.ndarray) -> MoveHistory:
+    # Bigger cubes have moves the 3x3 tables don't cover
+    if cube_size == 3:
+        return MoveHistory(state)
+    names = nxn_cube.move_names(cube_size)
+    return MoveHistory(state, names, np.stack([nxn_cube.move_table(cube_size, name) for name in names]))
 
-def reverse_rotate_side(side: str, plotter: plotting.QtInteractor, cube: dict):
+
+def undo_move(plotter: plotting.QtInteractor | None = None):
     global current_cube
-    # one rotation clockwise
-    new_cube = copy.deepcopy(cube)
-    neighbours_u = list(CUBE_NEIGHBOURS[side]["U"])
-    neighbours_d = list(CUBE_NEIGHBOURS[side]["D"])
-    neighbours_l = list(CUBE_NEIGHBOURS[side]["L"])
-    neighbours_r = list(CUBE_NEIGHBOURS[side]["R"])
-    new_cube = reverse_rotate_face(side, plotter, cube)
-    # Up
-    new_cube[neighbours_u[0]][neighbours_u[1]] = cube[neighbours_r[0]][neighbours_r[1]]
-    new_cube[neighbours_u[0]][neighbours_u[2]] = cube[neighbours_r[0]][neighbours_r[2]]
-    new_cube[neighbours_u[0]][neighbours_u[3]] = cube[neighbours_r[0]][neighbours_r[3]]
-    # Down
-    new_cube[neighbours_d[0]][neighbours_d[1]] = cube[neighbours_l[0]][neighbours_l[1]]
-    new_cube[neighbours_d[0]][neighbours_d[2]] = cube[neighbours_l[0]][neighbours_l[2]]
-    new_cube[neighbours_d[0]][neighbours_d[3]] = cube[neighbours_l[0]][neighbours_l[3]]
-    # Left
-    new_cube[neighbours_r[0]][neighbours_r[1]] = cube[neighbours_d[0]][neighbours_d[3]]
-    new_cube[neighbours_r[0]][neighbours_r[2]] = cube[neighbours_d[0]][neighbours_d[2]]
-    new_cube[neighbours_r[0]][neighbours_r[3]] = cube[neighbours_d[0]][neighbours_d[1]]
-    # Right
-    new_cube[neighbours_l[0]][neighbours_l[1]] = cube[neighbours_u[0]][neighbours_u[3]]
-    new_cube[neighbours_l[0]][neighbours_l[2]] = cube[neighbours_u[0]][neighbours_u[2]]
-    new_cube[neighbours_l[0]][neighbours_l[3]] = cube[neighbours_u[0]][neighbours_u[1]]
-    current_cube = new_cube
-    plotter = update_mesh(plotter=plotter)
+    finish_turn()
+    state = history.undo()
+    if state is not None:
+        current_cube = state.copy()
+        plotter = update_mesh(plotter=plotter)
 
 
-def randomise_cube(plotter: plotting.QtInteractor):
+def redo_move(plotter: plotting.QtInteractor | None = None):
     global current_cube
-    global user_moves
-    moves_list = list(MOVES)
-    for _ in range(100):
-        rotation_list = ["C", "CC"]
-        move = moves_list[random.randrange(0, 6)]
-        rotation = rotation_list[random.randrange(0, 2)]
-        cube_rotation(plotter, move, rotation, "Y")
+    finish_turn()
+    state = history.redo()
+    if state is not None:
+        current_cube = state.copy()
+        plotter = update_mesh(plotter=plotter)
 
 
-def reset_cube(plotter: plotting.QtInteractor):
+def go_to_move(position: int, plotter: plotting.QtInteractor | None = None):
+    # Show the cube as it was after the given number of recorded moves
     global current_cube
-    global user_moves
-    # Set the game cube to the start cube
-    current_cube = copy.deepcopy(START_CUBE)
+    finish_turn()
+    current_cube = history.jump(position).copy()
     plotter = update_mesh(plotter=plotter)
-    user_moves = []
 
 
 def initialise_window() -> QtWidgets.QWidget:
+    from PyQt6 import QtCore, QtGui, QtWidgets
+    global turn_animator
+
     # Create window
     window = QtWidgets.QWidget()
 
     # Generate the plot for the cube
     plotter = generate_model()
 
+    # Turns are animated on their own timer, and scrambles and solutions are played back one move per tick
+    turn_animator = TurnAnimator(plotter)
+    player = MovePlayer(plotter)
+
     # Initialise all of the buttons used
     randomise_button = QtWidgets.QPushButton("Randomise Cube")
     reset_button = QtWidgets.QPushButton("Reset Cube")
@@ -471,6 +427,31 @@ def initialise_window() -> QtWidgets.QWidget:
     rotate_cube_on_y = QtWidgets.QPushButton("Rotate Cube Y")
     reverse_rotate_cube_on_y = QtWidgets.QPushButton("Rotate Cube Y'")
     solve_cube_button = QtWidgets.QPushButton("Solve Cube")
+    pause_button = QtWidgets.QPushButton("Pause")
+    cancel_button = QtWidgets.QPushButton("Cancel")
+    undo_button = QtWidgets.QPushButton("Undo")
+    redo_button = QtWidgets.QPushButton("Redo")
+    go_to_move_button = QtWidgets.QPushButton("Go to Move")
+    move_number = QtWidgets.QSpinBox()
+    move_number.setRange(0, 2 ** 31 - 1)
+    speed_label = QtWidgets.QLabel("Moves per second")
+    speed_slider = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal)
+    speed_slider.setRange(1, 60)
+    speed_slider.setValue(DEFAULT_MOVES_PER_SECOND)
+    animate_checkbox = QtWidgets.QCheckBox("Animate Turns")
+    animate_checkbox.setChecked(animate_turns)
+    profile_checkbox = QtWidgets.QCheckBox("Profile")
+    profile_checkbox.setChecked(cube_profiler.enabled)
+    save_profile_button = QtWidgets.QPushButton("Save Profile")
+    profile_label = QtWidgets.QLabel()
+    profile_label.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.SystemFont.FixedFont))
+    profile_label.setVisible(cube_profiler.enabled)
+    # Refresh the stats overlay while profiling is on
+    profile_timer = QtCore.QTimer(window)
+    profile_timer.setInterval(500)
+    profile_timer.timeout.connect(lambda: profile_label.setText(cube_profiler.summary()))
+    if cube_profiler.enabled:
+        profile_timer.start()
 
     # Create layouts for the buttons
     layout_buttons_left = QtWidgets.QVBoxLayout()
@@ -512,6 +493,22 @@ def initialise_window() -> QtWidgets.QWidget:
     layout_additional_buttons = QtWidgets.QVBoxLayout()
     layout_additional_buttons.addLayout(layout_buttons)
     layout_additional_buttons.addWidget(solve_cube_button)
+    layout_additional_buttons.addWidget(pause_button)
+    layout_additional_buttons.addWidget(cancel_button)
+    layout_history = QtWidgets.QHBoxLayout()
+    layout_history.addWidget(undo_button)
+    layout_history.addWidget(redo_button)
+    layout_additional_buttons.addLayout(layout_history)
+    layout_go_to_move = QtWidgets.QHBoxLayout()
+    layout_go_to_move.addWidget(move_number)
+    layout_go_to_move.addWidget(go_to_move_button)
+    layout_additional_buttons.addLayout(layout_go_to_move)
+    layout_additional_buttons.addWidget(speed_label)
+    layout_additional_buttons.addWidget(speed_slider)
+    layout_additional_buttons.addWidget(animate_checkbox)
+    layout_additional_buttons.addWidget(profile_checkbox)
+    layout_additional_buttons.addWidget(save_profile_button)
+    layout_additional_buttons.addWidget(profile_label)
     layout_window.addWidget(plotter)
     layout_window.addLayout(layout_additional_buttons)
 
@@ -520,118 +517,302 @@ def initialise_window() -> QtWidgets.QWidget:
     window.setWindowTitle("Rubik's Cube")
 
     # Define actions for button
-    randomise_button.clicked.connect(lambda: randomise_cube(plotter=plotter))
-
-    rotate_f.clicked.connect(lambda: cube_rotation(plotter, "F", "C", *"Y"))
-    reverse_f.clicked.connect(lambda: cube_rotation(plotter, "F", "CC", *"Y"))
-    rotate_r.clicked.connect(lambda: cube_rotation(plotter, "R", "C", *"Y"))
-    reverse_r.clicked.connect(lambda: cube_rotation(plotter, "R", "CC", "Y"))
-    rotate_b.clicked.connect(lambda: cube_rotation(plotter, "B", "C", "Y"))
-    reverse_b.clicked.connect(lambda: cube_rotation(plotter, "B", "CC", "Y"))
-    rotate_l.clicked.connect(lambda: cube_rotation(plotter, "L", "C", "Y"))
-    reverse_l.clicked.connect(lambda: cube_rotation(plotter, "L", "CC", "Y"))
-    rotate_u.clicked.connect(lambda: cube_rotation(plotter, "U", "C", "Y"))
-    reverse_u.clicked.connect(lambda: cube_rotation(plotter, "U", "CC", "Y"))
-    rotate_d.clicked.connect(lambda: cube_rotation(plotter, "D", "C", "Y"))
-    reverse_d.clicked.connect(lambda: cube_rotation(plotter, "D", "CC", "Y"))
-
-    rotate_middle.clicked.connect(lambda: cube_rotation(plotter, "M", "C", "N"))
-    reverse_middle.clicked.connect(lambda: cube_rotation(plotter, "M", "CC", "N"))
-    rotate_equator.clicked.connect(lambda: cube_rotation(plotter, "E", "C", "N"))
-    reverse_equator.clicked.connect(lambda: cube_rotation(plotter, "E", "CC", "N"))
-    rotate_standing.clicked.connect(lambda: cube_rotation(plotter, "S", "C", "N"))
-    reverse_standing.clicked.connect(lambda: cube_rotation(plotter, "S", "CC", "N"))
+    randomise_button.clicked.connect(lambda: player.scramble())
+
+    rotate_f.clicked.connect(lambda: animated_rotation(plotter, "F", "C", *"Y"))
+    reverse_f.clicked.connect(lambda: animated_rotation(plotter, "F", "CC", *"Y"))
+    rotate_r.clicked.connect(lambda: animated_rotation(plotter, "R", "C", *"Y"))
+    reverse_r.clicked.connect(lambda: animated_rotation(plotter, "R", "CC", "Y"))
+    rotate_b.clicked.connect(lambda: animated_rotation(plotter, "B", "C", "Y"))
+    reverse_b.clicked.connect(lambda: animated_rotation(plotter, "B", "CC", "Y"))
+    rotate_l.clicked.connect(lambda: animated_rotation(plotter, "L", "C", "Y"))
+    reverse_l.clicked.connect(lambda: animated_rotation(plotter, "L", "CC", "Y"))
+    rotate_u.clicked.connect(lambda: animated_rotation(plotter, "U", "C", "Y"))
+    reverse_u.clicked.connect(lambda: animated_rotation(plotter, "U", "CC", "Y"))
+    rotate_d.clicked.connect(lambda: animated_rotation(plotter, "D", "C", "Y"))
+    reverse_d.clicked.connect(lambda: animated_rotation(plotter, "D", "CC", "Y"))
+
+    rotate_middle.clicked.connect(lambda: animated_rotation(plotter, "M", "C", "Y"))
+    reverse_middle.clicked.connect(lambda: animated_rotation(plotter, "M", "CC", "Y"))
+    rotate_equator.clicked.connect(lambda: animated_rotation(plotter, "E", "C", "Y"))
+    reverse_equator.clicked.connect(lambda: animated_rotation(plotter, "E", "CC", "Y"))
+    rotate_standing.clicked.connect(lambda: animated_rotation(plotter, "S", "C", "Y"))
+    reverse_standing.clicked.connect(lambda: animated_rotation(plotter, "S", "CC", "Y"))
 
     reset_button.clicked.connect(lambda: reset_cube(plotter))
 
-    solve_cube_button.clicked.connect(lambda: solve_cube())
-
-    rotate_cube_on_x.clicked.connect(lambda: cube_rotation(plotter, "RCX", "C", "Y"))
-    rotate_cube_on_y.clicked.connect(lambda: cube_rotation(plotter, "RCY", "C", "Y"))
-    reverse_rotate_cube_on_x.clicked.connect(lambda: cube_rotation(plotter, "RCX", "CC", "Y"))
-    reverse_rotate_cube_on_y.clicked.connect(lambda: cube_rotation(plotter, "RCY", "CC", "Y"))
+    solve_cube_button.clicked.connect(lambda: player.play_solution())
+    # The solver only knows the 3x3 cube
+    solve_cube_button.setEnabled(cube_size == 3)
+    pause_button.clicked.connect(lambda: pause_button.setText("Resume" if player.toggle_pause() else "Pause"))
+    cancel_button.clicked.connect(lambda: player.cancel())
+    undo_button.clicked.connect(lambda: undo_move(plotter))
+    redo_button.clicked.connect(lambda: redo_move(plotter))
+    go_to_move_button.clicked.connect(lambda: go_to_move(move_number.value(), plotter))
+    speed_slider.valueChanged.connect(lambda value: player.set_speed(value))
+    animate_checkbox.toggled.connect(lambda checked: set_animate_turns(checked))
+    profile_checkbox.toggled.connect(lambda checked: toggle_profiling(checked, profile_timer, profile_label))
+    save_profile_button.clicked.connect(lambda: save_profile(window))
+
+    rotate_cube_on_x.clicked.connect(lambda: animated_rotation(plotter, "RCX", "C", "Y"))
+    rotate_cube_on_y.clicked.connect(lambda: animated_rotation(plotter, "RCY", "C", "Y"))
+    reverse_rotate_cube_on_x.clicked.connect(lambda: animated_rotation(plotter, "RCX", "CC", "Y"))
+    reverse_rotate_cube_on_y.clicked.connect(lambda: animated_rotation(plotter, "RCY", "CC", "Y"))
 
     return window
 
 
+def set_animate_turns(checked: bool):
+    global animate_turns
+    animate_turns = checked
+    finish_turn()
+
+
+def toggle_profiling(checked: bool, timer: QtCore.QTimer, label: QtWidgets.QLabel):
+    # Start or stop recording and show the stats overlay only while recording
+    if checked:
+        cube_profiler.enable()
+        timer.start()
+    else:
+        cube_profiler.disable()
+        timer.stop()
+    label.setText(cube_profiler.summary())
+    label.setVisible(checked)
+
+
+def save_profile(window: QtWidgets.QWidget):
+    from PyQt6 import QtWidgets
+    path, _ = QtWidgets.QFileDialog.getSaveFileName(window, "Save Profile", "cube_profile.json", "JSON (*.json)")
+    if path:
+        cube_profiler.dump(path)
+
+
+@profiled()
+@batched
 def cube_rotation(plotter: plotting.QtInteractor, move: str, direction: str, record_moves: str):
-    global user_moves
     global current_cube
-    if move == "M":
-        if direction == "C":
-            cube_rotation(plotter, "L", "C", "Y")
-            cube_rotation(plotter, "R", "CC", "Y")
-        elif direction == "CC":
-            cube_rotation(plotter, "L", "CC", "Y")
-            cube_rotation(plotter, "R", "C", "Y")
-    elif move == "E":
-        if direction == "C":
-            cube_rotation(plotter, "D", "CC", "Y")
-            cube_rotation(plotter, "U", "C", "Y")
-        elif direction == "CC":
-            cube_rotation(plotter, "D", "C", "Y")
-            cube_rotation(plotter, "U", "CC", "Y")
-    elif move == "S":
+    # Moves arrive as seen, and are recorded as made on current_cube
+    if move in SLICE_MOVES:
         if direction == "C":
-            cube_rotation(plotter, "B", "C", "Y")
-            cube_rotation(plotter, "F", "CC", "Y")
+            current_cube = turn(current_cube, cube_move(move))
         elif direction == "CC":
-            cube_rotation(plotter, "B", "CC", "Y")
-            cube_rotation(plotter, "F", "C", "Y")
+            current_cube = turn(current_cube, cube_move(move + "'"))
     elif move == "RCX":
+        # Holding the cube differently is not a move, so it is never recorded
         if direction == "C":
-            rotate_cube_x(plotter, current_cube)
-            if record_moves == "Y":
-                user_moves.append((plotter, "RCX", "CC", "N"))
+            rotate_cube_x(plotter)
         elif direction == "CC":
-            reverse_rotate_cube_x(plotter, current_cube)
-            if record_moves == "Y":
-                user_moves.append((plotter, "RCX", "C", "N"))
+            reverse_rotate_cube_x(plotter)
+        return
     elif move == "RCY":
         if direction == "C":
-            rotate_cube_y(plotter, current_cube)
-            if record_moves == "Y":
-                user_moves.append((plotter, "RCY", "CC", "N"))
+            rotate_cube_y(plotter)
         elif direction == "CC":
-            reverse_rotate_cube_y(plotter, current_cube)
-            if record_moves == "Y":
-                user_moves.append((plotter, "RCY", "C", "N"))
+            reverse_rotate_cube_y(plotter)
+        return
     elif direction == "C":
         rotate_side(move, plotter, current_cube)
-        if record_moves == "Y":
-            user_moves.append((plotter, move, "CC", "N"))
     elif direction == "CC":
         reverse_rotate_side(move, plotter, current_cube)
-        if record_moves == "Y":
-            user_moves.append((plotter, move, "C", "N"))
+    if record_moves == "Y":
+        history.push(cube_move(move_name(move, direction)))
     plotter = update_mesh(plotter)
 
 
-def solve_cube():
-    global user_moves
-    for x in range(len(user_moves) - 1, - 1, -1):
-        cube_rotation(user_moves[x][0], user_moves[x][1], user_moves[x][2], "N")
-        time.sleep(0.02)
-    user_moves = []
+@batched
+def solve_cube(plotter: plotting.QtInteractor | None = None):
+    # Search for a short solution from the current state rather than replaying the moves made
+    if cube_size != 3:
+        raise ValueError("Only the 3x3 cube can be solved")
+    finish_turn()
+    for move in quarter_turns(solution_cache.solve(current_cube)):
+        cube_rotation(plotter, *split_move(shown_move(move)), "Y")
+
+
+class MovePlayer:
+    # Steps through a queue of moves on a QTimer so the window keeps repainting between moves
+    def __init__(self, plotter: plotting.QtInteractor, moves_per_second: int = DEFAULT_MOVES_PER_SECOND):
+        from PyQt6 import QtCore
+        self.plotter = plotter
+        self.queue = collections.deque()
+        self.solution = None
+        self.solved_state = None
+        self.solve_started = 0.0
+        self.paused = False
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.step)
+        self.set_speed(moves_per_second)
+        # Solving runs in a separate process so the search never holds up the interactor
+        self.solver = futures.ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+    def play(self, moves, record_moves: str = "N"):
+        self.queue.extend((move, record_moves) for move in quarter_turns(moves))
+        self.timer.start()
+
+    def scramble(self):
+        # The 3x3 jumps to a uniformly random position at once, bigger cubes play out random moves
+        if cube_size == 3:
+            self.cancel()
+            randomise_cube(self.plotter)
+        else:
+            self.play(scramble_moves(100), "Y")
+
+    def play_solution(self):
+        # Drop anything still queued and solve from the state shown now
+        self.queue.clear()
+        finish_turn()
+        # Check here, since a state no cube can reach would otherwise only fail inside the worker
+        try:
+            cube_validation.check_state(current_cube)
+        except ValueError as error:
+            from PyQt6 import QtWidgets
+            QtWidgets.QMessageBox.warning(None, "Cannot Solve", str(error))
+            return
+        cached = solution_cache.get(current_cube)
+        if cached is not None:
+            self.play(cached, "Y")
+            return
+        self.solved_state = current_cube.copy()
+        self.solve_started = time.perf_counter()
+        self.solution = self.solver.submit(solve, self.solved_state)
+        self.timer.start()
+
+    def step(self):
+        if self.solution is not None:
+            if not self.solution.done():
+                return
+            moves = self.solution.result()
+            self.solution = None
+            # The search runs in the worker process, so time it from here
+            cube_profiler.record("solve (worker)", time.perf_counter() - self.solve_started)
+            # The cube was turned while the solution was being found, so solve again
+            if (current_cube != self.solved_state).any():
+                self.play_solution()
+                return
+            solution_cache.put(self.solved_state, moves)
+            self.queue.extend((move, "Y") for move in quarter_turns(moves))
+        if self.paused:
+            return
+        if not self.queue:
+            self.timer.stop()
+            return
+        # Queued moves are made on current_cube, so they still land right if the cube is turned over meanwhile
+        move, record_moves = self.queue.popleft()
+        animated_rotation(self.plotter, *split_move(shown_move(move)), record_moves, self.turn_seconds)
+
+    def toggle_pause(self) -> bool:
+        self.paused = not self.paused
+        return self.paused
+
+    def cancel(self):
+        # Drop the queued moves and ignore any solution still being computed
+        self.queue.clear()
+        if self.solution is not None:
+            self.solution.cancel()
+            self.solution = None
+        self.timer.stop()
+
+    def set_speed(self, moves_per_second: int):
+        self.timer.setInterval(1000 // moves_per_second)
+        # Each turn finishes well before the next one starts, so fast playback is not animated at all
+        self.turn_seconds = min(cube_animation.TURN_SECONDS, 0.8 / moves_per_second)
+
+
+class TurnAnimator:
+    # Plays one turn at a time by moving only the turning layers' points on a 60 fps timer,
+    # then commits the turn with cube_rotation, which permutes the colours and records the move
+    def __init__(self, plotter: plotting.QtInteractor):
+        from PyQt6 import QtCore
+        self.plotter = plotter
+        self.animation = None
+        self.move = None
+        self.components = dict()
+        self.timer = QtCore.QTimer()
+        self.timer.setInterval(1000 // cube_animation.FRAMES_PER_SECOND)
+        self.timer.timeout.connect(self.step)
+
+    def turn_components(self, move: str) -> list:
+        # The cells each move turns never change, so they are worked out once per size and move
+        key = (cube_size, move)
+        if key not in self.components:
+            cell_stickers = MESH_STICKERS if cube_size == 3 else np.arange(6 * cube_size ** 2)
+            self.components[key] = cube_animation.turn_components(cube_size, move, cell_stickers)
+        return self.components[key]
+
+    def turn(self, move: str, direction: str, record_moves: str, seconds: float = cube_animation.TURN_SECONDS):
+        self.finish()
+        frames = round(seconds * cube_animation.FRAMES_PER_SECOND)
+        if not animate_turns or cube_mesh is None or frames < 2:
+            cube_rotation(self.plotter, move, direction, record_moves)
+            return
+        self.animation = TurnAnimation(cube_mesh.points, self.turn_components(move_name(move, direction)),
+                                       np.full(3, cube_size / 2), frames)
+        self.move = (move, direction, record_moves)
+        self.timer.start()
+
+    def step(self):
+        if self.animation is None:
+            self.timer.stop()
+            return
+        done = self.animation.step()
+        cube_profiler.count("animation frame")
+        self.plotter.render()
+        if done:
+            self.finish()
+
+    def finish(self):
+        # Complete the turn in progress at once, so anything that reads the cube sees it done
+        if self.animation is None:
+            return
+        self.timer.stop()
+        self.animation.finish()
+        move = self.move
+        self.animation = None
+        self.move = None
+        cube_rotation(self.plotter, *move)
+
+
+def animated_rotation(plotter: plotting.QtInteractor | None, move: str, direction: str, record_moves: str,
+                      seconds: float = cube_animation.TURN_SECONDS):
+    # Animate turns once the window exists, otherwise turn at once
+    if turn_animator is None:
+        cube_rotation(plotter, move, direction, record_moves)
+    else:
+        turn_animator.turn(move, direction, record_moves, seconds)
+
+
+def finish_turn():
+    if turn_animator is not None:
+        turn_animator.finish()
 
 
 def main():
+    from PyQt6 import QtWidgets
     global current_cube
-    global user_moves
+    global orientation
+    global history
+    global cube_size
 
-    user_moves = []
+    parser = argparse.ArgumentParser(description="Play with a Rubik's cube.")
+    parser.add_argument("--size", type=int, default=3, choices=range(nxn_cube.MIN_SIZE, nxn_cube.MAX_SIZE + 1),
+                        metavar="N",
+                        help=f"stickers along each edge, {nxn_cube.MIN_SIZE} to {nxn_cube.MAX_SIZE} (default: 3)")
+    args, qt_args = parser.parse_known_args()
 
     # Generate the cube to be used in game
-    current_cube = copy.deepcopy(START_CUBE)
+    cube_size = args.size
+    current_cube = nxn_cube.solved_state(cube_size)
+    orientation = cube_orientation.IDENTITY
+    history = new_history(current_cube)
 
     # Initialise an app to display the cube
-    app = QtWidgets.QApplication(sys.argv)
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
 
     # Initialise and show the game window
     window = initialise_window()
     window.show()
 
-    app.exec_()
+    app.exec()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import collections
+import os
+import shelve
+
+from cube_core import as_state
+from cube_solver import solve
+from cube_symmetry import SYMMETRY_INVERSES, canonical_state, remap_moves
+from move_compiler import format_moves, parse_moves
+
+# Solutions kept in memory before the least recently used ones are dropped
+DEFAULT_MAX_ENTRIES = 100000
+
+# Where the window keeps solutions between sessions, if anywhere
+DEFAULT_CACHE_PATH = os.environ.get("RUBIK_CUBE_SOLUTION_CACHE")
+
+
+class SolutionCache:
+    # Solutions keyed on the symmetry class of the cube, so rotated and mirrored positions share an entry
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, path: str | None = None, mirrors: bool = True):
+        self.max_entries = max_entries
+        self.mirrors = mirrors
+        self.entries = collections.OrderedDict()
+        # Entries spill to a shelve file when given one, which keeps them across runs
+        self.store = shelve.open(path) if path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, cube) -> tuple:
+        canonical, symmetry = canonical_state(as_state(cube), self.mirrors)
+        return canonical.tobytes(), symmetry
+
+    def _remember(self, key: bytes, solution: tuple):
+        self.entries[key] = solution
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, cube) -> list | None:
+        # The cached solution for this cube, rewritten for the way it is held, or None
+        key, symmetry = self._key(cube)
+        solution = self.entries.get(key)
+        if solution is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        elif self.store is not None and key.hex() in self.store:
+            solution = tuple(parse_moves(self.store[key.hex()]))
+            self._remember(key, solution)
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            return None
+        return remap_moves(solution, symmetry)
+
+    def put(self, cube, solution):
+        # Store a solution of this cube as the matching solution of its class representative
+        key, symmetry = self._key(cube)
+        solution = tuple(remap_moves(solution, SYMMETRY_INVERSES[symmetry]))
+        self._remember(key, solution)
+        if self.store is not None:
+            self.store[key.hex()] = format_moves(solution)
+
+    def solve(self, cube, solver=solve) -> list:
+        # Answer from the cache, or solve the cube and remember the answer
+        solution = self.get(cube)
+        if solution is None:
+            solution = solver(cube)
+            self.put(cube, solution)
+        return solution
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {"entries": len(self.entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0}
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
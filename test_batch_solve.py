@@ -0,0 +1,28 @@
+import pytest
+
+from batch_solve import read_scramble
+from cube_core import COLOUR_LETTERS, SOLVED_STATE, apply_moves, format_state
+from cube_scrambler import random_state
+from move_compiler import parse_moves
+
+
+def test_reads_a_state_of_colour_initials():
+    state = random_state(1)
+    assert (read_scramble(format_state(state)) == state).all()
+
+
+def test_reads_moves_written_without_spaces_as_moves():
+    # 54 letters that are all colour initials, but only make sense as moves
+    scramble = "RB" * 27
+    assert (read_scramble(scramble) == apply_moves(SOLVED_STATE, parse_moves(scramble))).all()
+
+
+def test_reads_moves_with_spaces():
+    assert (read_scramble("R U R' U'") == apply_moves(SOLVED_STATE, ["R", "U", "R'", "U'"])).all()
+
+
+def test_unreachable_state_reports_why():
+    letters = list(format_state(SOLVED_STATE))
+    letters[0] = next(letter for letter in COLOUR_LETTERS if letter != letters[0])
+    with pytest.raises(ValueError, match="nine stickers"):
+        read_scramble("".join(letters))
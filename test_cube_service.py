@@ -0,0 +1,98 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+
+from cube_core import SOLVED_STATE, apply_moves, format_state, parse_state
+from cube_service import CubeService, ServiceClient, start_service
+from cube_validation import is_valid
+from move_compiler import parse_moves
+from solution_cache import SolutionCache
+
+SCRAMBLE = "R U R' U' F2 D L' B"
+
+
+def run_with_service(check):
+    # Start a service on a free localhost port, run check(client) against it and shut everything down
+    async def main():
+        service = CubeService(workers=1, cache=SolutionCache())
+        server = await start_service(service, port=0)
+        client = ServiceClient(port=server.sockets[0].getsockname()[1])
+        try:
+            return await check(client)
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+            service.close()
+    return asyncio.run(main())
+
+
+def test_apply_matches_apply_moves():
+    async def check(client):
+        return await client.request("POST", "/apply", {"state": format_state(SOLVED_STATE), "moves": SCRAMBLE})
+    status, reply = run_with_service(check)
+    assert status == HTTPStatus.OK
+    assert reply["state"] == format_state(apply_moves(SOLVED_STATE, parse_moves(SCRAMBLE)))
+
+
+def test_apply_accepts_a_list_of_move_names():
+    async def check(client):
+        return await client.request("POST", "/apply", {"moves": parse_moves(SCRAMBLE)})
+    status, reply = run_with_service(check)
+    assert status == HTTPStatus.OK
+    assert reply["state"] == format_state(apply_moves(SOLVED_STATE, parse_moves(SCRAMBLE)))
+
+
+def test_solve_round_trip():
+    async def check(client):
+        return await client.request("POST", "/solve", {"scramble": SCRAMBLE})
+    status, reply = run_with_service(check)
+    assert status == HTTPStatus.OK
+    scrambled = apply_moves(SOLVED_STATE, parse_moves(SCRAMBLE))
+    assert (apply_moves(scrambled, parse_moves(reply["solution"])) == SOLVED_STATE).all()
+    assert reply["length"] == len(parse_moves(reply["solution"]))
+
+
+def test_scramble_is_seeded_and_valid():
+    async def check(client):
+        first = await client.request("POST", "/scramble", {"seed": 7, "count": 3})
+        second = await client.request("POST", "/scramble", {"seed": 7, "count": 3})
+        return first, second
+    (status, reply), (_, again) = run_with_service(check)
+    assert status == HTTPStatus.OK
+    assert reply["states"] == again["states"]
+    assert len(reply["states"]) == 3
+    assert all(is_valid(parse_state(state)) for state in reply["states"])
+
+
+@pytest.mark.parametrize("moves", [[999], [-1], [["R", "U"]], [None], 5])
+def test_bad_moves_are_rejected_without_holding_up_the_batch(moves):
+    async def check(client):
+        good = ServiceClient(client.host, client.port)
+        try:
+            # Sent together so both land in the same apply batch
+            return await asyncio.wait_for(asyncio.gather(
+                client.request("POST", "/apply", {"moves": moves}),
+                good.request("POST", "/apply", {"moves": "R"})), timeout=10)
+        finally:
+            await good.close()
+    (bad_status, bad_reply), (good_status, good_reply) = run_with_service(check)
+    assert bad_status == HTTPStatus.BAD_REQUEST
+    assert "error" in bad_reply
+    assert good_status == HTTPStatus.OK
+    assert good_reply["state"] == format_state(apply_moves(SOLVED_STATE, ["R"]))
+
+
+def test_negative_content_length_is_a_bad_request():
+    async def check(client):
+        reader, writer = await asyncio.open_connection(client.host, client.port)
+        try:
+            writer.write(b"POST /apply HTTP/1.1\r\nHost: localhost\r\nContent-Length: -1\r\n\r\n")
+            await writer.drain()
+            return await asyncio.wait_for(reader.read(), timeout=10)
+        finally:
+            writer.close()
+    response = run_with_service(check)
+    assert response.startswith(b"HTTP/1.1 400 ")
+    assert b"Malformed request" in response
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from cube_core import SOLVED_STATE, apply_moves
+from cube_scrambler import random_states
+from cube_solver import SOLVER_MOVES, solve
+from move_compiler import parse_moves
+
+
+def random_scramble(length: int, rng: np.random.Generator) -> list:
+    # Face turns that never turn the same face twice in a row, so no shorter sequence is obvious
+    moves = []
+    while len(moves) < length:
+        move = SOLVER_MOVES[rng.integers(len(SOLVER_MOVES))]
+        if not moves or move[0] != moves[-1][0]:
+            moves.append(move)
+    return moves
+
+
+@pytest.mark.parametrize("scramble, expected", [("R", "R'"), ("R U R' U'", "U R U' R'"), ("F2", "F2")])
+def test_solves_known_scrambles_by_undoing_them(scramble, expected):
+    assert solve(apply_moves(SOLVED_STATE, parse_moves(scramble))) == parse_moves(expected)
+
+
+@pytest.mark.parametrize("length", range(1, 8))
+def test_short_scrambles_are_solved_within_their_length(length):
+    rng = np.random.default_rng(length)
+    for _ in range(5):
+        state = apply_moves(SOLVED_STATE, random_scramble(length, rng))
+        solution = solve(state)
+        assert len(solution) <= length
+        assert (apply_moves(state, solution) == SOLVED_STATE).all()
+
+
+def test_solved_cube_needs_no_moves():
+    assert solve(SOLVED_STATE) == []
+
+
+def test_random_states_are_solved():
+    for state in random_states(3, np.random.default_rng(0)):
+        solution = solve(state)
+        assert len(solution) <= 24
+        assert (apply_moves(state, solution) == SOLVED_STATE).all()